@@ -0,0 +1,296 @@
+import argparse;
+import json;
+import resource;
+import subprocess;
+import sys;
+import time;
+import timeit;
+
+import minipor;
+import model;
+import model.metrics;
+import model.reduction;
+import model.treeset;
+import peterson;
+
+# state sets a suite run can use
+STORES = {"set": set, "treeset": model.treeset.TreeSet};
+
+# runs shorter than this, or with fewer states, are too noisy to compare
+MIN_SECONDS = 0.05;
+MIN_STATES = 1000;
+
+def rate(mdl, nextStates):
+    """
+    Explores [mdl] using the successor generator [nextStates].
+    Returns a tuple (states, seconds).
+    """
+    mdl.nextStates = nextStates;
+
+    start = time.perf_counter();
+    count = sum(1 for _ in mdl.reach());
+    return (count, time.perf_counter() - start);
+
+def vectorRate(mdl):
+    """
+    Explores [mdl] using its NumPy frontier engine.
+    Returns a tuple (states, seconds).
+    """
+    start = time.perf_counter();
+    count = sum(len(f) for f in mdl.vectorBFS());
+    return (count, time.perf_counter() - start);
+
+def peterson_kernels(sizes):
+    """
+    Compare the table-driven Peterson kernel with the branch-based
+     reference generator for each number of processes in [sizes].
+    """
+    print("%-3s %-8s %10s %10s %12s" % ("N", "kernel", "states", "seconds",
+                                        "states/sec"));
+    for n in sizes:
+        mdl = peterson.Model(n);
+        kernels = [("branch", mdl.nextStatesBranch),
+                   ("table", mdl.nextStates)];
+        for name, fn in kernels:
+            count, t = rate(mdl, fn);
+            print("%-3d %-8s %10d %10.2f %12.0f" % (n, name, count, t,
+                                                     count / t));
+
+        if(peterson.numpy is not None):
+            count, t = vectorRate(mdl);
+            print("%-3d %-8s %10d %10.2f %12.0f" % (n, "vector", count, t,
+                                                     count / t));
+
+def slot_access(number=1000000):
+    """
+    Compare the ways to read and write a named slot of a minipor state, each
+     repeated [number] times.
+    """
+    mdl = minipor.Model();
+    state = mdl.initialState.clone();
+    i = mdl.layout.offsets["y"];
+
+    tests = [
+        ("read", "name", "state['y']"),
+        ("read", "attribute", "state.y"),
+        ("read", "offset", "state.slots[i]"),
+        ("write", "name", "state['y'] = 3"),
+        ("write", "attribute", "state.y = 3"),
+        ("write", "offset", "state.slots[i] = 3"),
+    ];
+    print("%-6s %-10s %10s" % ("access", "by", "ns/access"));
+    for access, by, stmt in tests:
+        t = min(timeit.repeat(stmt, number=number, repeat=3,
+                              globals={"state": state, "i": i}));
+        print("%-6s %-10s %10.1f" % (access, by, 1e9 * t / number));
+
+def configs(sizes, plugin=None):
+    """
+    Returns the names of the suite's model configurations: Peterson for each
+     number of processes in [sizes], minipor with and without POR, and the
+     PINS [plugin] if given.
+    """
+    names = ["peterson:%d" % n for n in sizes];
+    names += ["minipor", "minipor:por"];
+    if(plugin is not None):
+        names.append("pins:" + plugin);
+    return names;
+
+def makeModel(config):
+    """
+    Returns the model for a configuration name [config].
+    """
+    kind, _, arg = config.partition(":");
+    if(kind=="peterson"):
+        return peterson.Model(int(arg));
+    if(kind=="minipor"):
+        mdl = minipor.Model();
+        return model.reduction.POR(mdl) if arg=="por" else mdl;
+    if(kind=="pins"):
+        from model import pins;
+        return pins.Model(arg);
+
+    raise ValueError("unknown configuration %r" % config);
+
+def measure(config, store):
+    """
+    Explores the model of [config] once, keeping visited states in a state
+     set of kind [store].
+    Returns a dict of results.
+    """
+    mdl = makeModel(config);
+    visited = STORES[store]();
+
+    before = model.metrics.rss();
+    start = time.perf_counter();
+    count = sum(1 for _ in mdl.reach(visited=visited));
+    seconds = time.perf_counter() - start;
+    after = model.metrics.rss();
+
+    # peak RSS is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;
+    if(sys.platform!="darwin"):
+        peak *= 1024;
+
+    return {
+        "config": config,
+        "store": store,
+        "states": count,
+        "seconds": seconds,
+        "statesPerSec": count / (seconds or 1e-9),
+        "peakMemory": peak,
+        "bytesPerState": (after - before) / max(count, 1),
+    };
+
+def run(config, store, timeout=None):
+    """
+    Measures [config] with [store] in a fresh interpreter, so that memory
+     measurements do not include earlier runs, giving up after [timeout]
+     seconds.
+    Returns a dict of results, with a "timeout" entry if it timed out, or an
+     "error" entry holding the exit code if it failed.
+    """
+    args = [sys.executable, __file__, "measure", config, store];
+    try:
+        out = subprocess.run(args, stdout=subprocess.PIPE, check=True,
+                             timeout=timeout).stdout;
+    except subprocess.TimeoutExpired:
+        return {"config": config, "store": store, "timeout": timeout};
+    except subprocess.CalledProcessError as e:
+        return {"config": config, "store": store, "error": e.returncode};
+
+    return json.loads(out);
+
+def suite(names, stores, repeat=1, timeout=None):
+    """
+    Measures each configuration in [names] with each state set in [stores],
+     keeping the fastest of [repeat] runs.
+    Returns the list of results.
+    """
+    print("%-24s %-8s %10s %10s %12s %10s %8s" % ("config", "store", "states",
+          "seconds", "states/sec", "peak MB", "B/state"));
+
+    results = [];
+    for config in names:
+        for store in stores:
+            best = None;
+            for _ in range(repeat):
+                r = run(config, store, timeout);
+                if("timeout" in r or "error" in r):
+                    best = r;
+                    break;
+                if(best is None or r["seconds"] < best["seconds"]):
+                    best = r;
+
+            results.append(best);
+            if("timeout" in best):
+                print("%-24s %-8s timed out after %gs" % (config, store,
+                                                          timeout));
+            elif("error" in best):
+                print("%-24s %-8s failed with exit code %d"
+                      % (config, store, best["error"]));
+            else:
+                print("%-24s %-8s %10d %10.2f %12.0f %10.1f %8.0f"
+                      % (config, store, best["states"], best["seconds"],
+                         best["statesPerSec"], best["peakMemory"] / 2**20,
+                         best["bytesPerState"]));
+
+    return results;
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Compares [results] with those of a [baseline], flagging runs that are
+     slower or use more memory per state by more than [tolerance] (a
+     fraction), or find a different number of states. Times and memory are
+     only compared for runs that are long and large enough to be reliable.
+    Returns the list of regressions, as strings.
+    """
+    base = {(r["config"], r["store"]): r for r in baseline};
+    limit = 1 + tolerance;
+
+    regressions = [];
+    for r in results:
+        key = (r["config"], r["store"]);
+        b = base.get(key, None);
+        if(b is None or "timeout" in b or "error" in b):
+            continue;
+
+        name = "%s/%s" % key;
+        if("timeout" in r):
+            regressions.append("%s: timed out (baseline %.2fs)"
+                               % (name, b["seconds"]));
+            continue;
+        if("error" in r):
+            regressions.append("%s: failed with exit code %d"
+                               % (name, r["error"]));
+            continue;
+
+        if(r["states"]!=b["states"]):
+            regressions.append("%s: %d states (baseline %d)"
+                               % (name, r["states"], b["states"]));
+        if(b["seconds"] >= MIN_SECONDS
+           and r["seconds"] > b["seconds"] * limit):
+            regressions.append("%s: %.2fs (baseline %.2fs)"
+                               % (name, r["seconds"], b["seconds"]));
+        if(b["states"] >= MIN_STATES
+           and r["bytesPerState"] > b["bytesPerState"] * limit):
+            regressions.append("%s: %.0f bytes/state (baseline %.0f)"
+                               % (name, r["bytesPerState"],
+                                  b["bytesPerState"]));
+
+    return regressions;
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark models, "
+                                     "search engines and state sets.");
+    sub = parser.add_subparsers(dest="command");
+
+    p = sub.add_parser("kernels", help="compare the Peterson kernels");
+    p.add_argument("sizes", type=int, nargs="*", default=[2, 3]);
+
+    p = sub.add_parser("slots", help="compare named slot access");
+    p.add_argument("--number", type=int, default=1000000);
+
+    p = sub.add_parser("suite", help="run the benchmark suite");
+    p.add_argument("--sizes", type=int, nargs="+", default=[2, 3, 4, 5]);
+    p.add_argument("--stores", nargs="+", default=list(STORES),
+                   choices=list(STORES));
+    p.add_argument("--pins", metavar="PLUGIN",
+                   help="also benchmark a PINS plugin");
+    p.add_argument("--repeat", type=int, default=1);
+    p.add_argument("--timeout", type=float, default=300,
+                   help="seconds before a run is abandoned");
+    p.add_argument("-o", "--output", help="save the results as JSON");
+    p.add_argument("-b", "--baseline",
+                   help="compare with results saved earlier");
+    p.add_argument("--tolerance", type=float, default=0.1,
+                   help="allowed slowdown or growth, as a fraction");
+
+    p = sub.add_parser("measure", help="measure a single run");
+    p.add_argument("config");
+    p.add_argument("store", choices=list(STORES));
+
+    args = parser.parse_args();
+    if(args.command=="measure"):
+        print(json.dumps(measure(args.config, args.store)));
+    elif(args.command=="slots"):
+        slot_access(args.number);
+    elif(args.command=="suite"):
+        names = configs(args.sizes, args.pins);
+        results = suite(names, args.stores, args.repeat, args.timeout);
+        if(args.output):
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2);
+
+        if(args.baseline):
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.tolerance);
+            for r in regressions:
+                print("regression: " + r);
+            if(regressions):
+                sys.exit(1);
+    else:
+        peterson_kernels(getattr(args, "sizes", None) or [2, 3]);
+
+if(__name__=="__main__"):
+    main();
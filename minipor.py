@@ -11,10 +11,10 @@ class State(model.slotState.SlotState):
         """
         labels = set();
 
-        labels.add("pcA==%d" % self["pcA"]);
-        labels.add("pcB==%d" % self["pcB"]);
+        labels.add("pcA==%d" % self.pcA);
+        labels.add("pcB==%d" % self.pcB);
 
-        if(self["y"]==3):
+        if(self.y==3):
             labels.add("y==3");
 
         mdl = self.model;
@@ -25,14 +25,18 @@ class Model(model.Model):
     POR toy problem model object.
 
     This model is the "Commutativity is Not Enough" example used in the lecture
-     about Partial Order Reduction.
+     about Partial Order Reduction. If [arena] is set, the slots of states are
+     kept in an arena (see `slotState.Arena`).
     """
     name = "Mini POR model";
-    def __init__(self):
+    def __init__(self, arena=False):
         super().__init__();
 
-        s = ["pcA", "pcB", "a", "x", "y"];
-        self.initialState = State(self, s);
+        # slots can be accessed by name, as in state.pcA
+        self.layout = model.slotState.Layout(["pcA", "pcB", "a", "x", "y"],
+                                             arena);
+        self.State = self.layout.bind(State);
+        self.initialState = self.State(self, self.layout);
 
         self.actions.update({
             "a = 0": {
@@ -98,32 +102,38 @@ class Model(model.Model):
             },
         });
 
+    def unpack(self, data):
+        arena = self.layout.arena;
+        if(arena is not None):
+            return self.State(self, self.layout, arena.new(data));
+        return self.State(self, self.layout, list(data));
+
     def nextStates(self, src):
         # first process
         dst = src.clone();
-        if(src["pcA"]==0):
-            dst["pcA"] = 1;
-            dst["a"] = 0;
+        if(src.pcA==0):
+            dst.pcA = 1;
+            dst.a = 0;
             yield (dst, self.actions["a = 0"]);
 
-        elif(src["pcA"]==1):
-            dst["pcA"] = 2;
-            dst["y"] = 2;
+        elif(src.pcA==1):
+            dst.pcA = 2;
+            dst.y = 2;
             yield (dst, self.actions["y = 2"]);
 
-        elif(src["pcA"]==2 and dst["y"]==3):
+        elif(src.pcA==2 and dst.y==3):
             yield (dst, self.actions["await (y==3)"]);
 
         # second process
         dst = src.clone();
-        if(src["pcB"]==0):
-            dst["pcB"] = 1;
-            dst["x"] = 1;
+        if(src.pcB==0):
+            dst.pcB = 1;
+            dst.x = 1;
             yield (dst, self.actions["x = 1"]);
 
-        elif(src["pcB"]==1):
-            dst["pcB"] = 2;
-            dst["y"] = 3;
+        elif(src.pcB==1):
+            dst.pcB = 2;
+            dst.y = 3;
             yield (dst, self.actions["y = 3"]);
 
 def main():
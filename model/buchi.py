@@ -143,7 +143,7 @@ class Product(model.Model):
      [model].
     """
     class State(model.State):
-        __slots__ = ["bState", "mState", "accept"];
+        __slots__ = ["bState", "mState", "count"];
         def __init__(self, model, b, m, a):
             super().__init__(model);
 
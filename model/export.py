@@ -0,0 +1,280 @@
+import json;
+import mmap;
+import struct;
+import zlib;
+
+from .metrics import Observer;
+
+# Binary state graph files start with a header of the magic string, version,
+#  flags, and the number of states and edges; edge records follow, each
+#  consisting of the source state ID, action ID and target state ID as
+#  little-endian 32-bit integers. The action names follow the records, as a
+#  32-bit length and a JSON list. If the file is compressed, everything after
+#  the header is a single zlib stream.
+MAGIC = b"LTSB";
+VERSION = 1;
+COMPRESSED = 0x1;
+
+HEADER = struct.Struct("<4sHHQQ");
+EDGE = struct.Struct("<III");
+
+class Writer(Observer):
+    """
+    Abstract state graph writer object.
+
+    Passed as the observer of an exploration, a writer streams the
+     transitions of the explored state graph to a file as they are
+     generated. States are numbered in the order they are first seen, so
+     the initial state is state 0; actions are numbered in the order of the
+     model's `actions`.
+
+    State IDs are taken from the exploration's visited states if they
+     provide them: the IDs of a breadth-first search (see `search.BFS`), or
+     a state set with a find function (see `treeset.TreeSet`). With other
+     state sets, the writer numbers the states itself, keeping a map of all
+     of them.
+
+    The file is completed when the exploration ends, even if it stops
+     early; a writer can also be completed by calling [close], or by using
+     it as a context manager.
+    """
+    def __init__(self, path):
+        self.path = path;
+        self.file = None;
+
+        self.visited = None;
+        self.ids = None;
+        self.actions = [];
+        self.actionIds = {};
+        self.edges = 0;
+
+    def begin(self, model, visited):
+        self.visited = visited;
+        self.ids = None;
+        if(isinstance(visited, dict)):
+            self._state = visited.__getitem__;
+        elif(hasattr(visited, "find")):
+            self._state = visited.find;
+        else:
+            self.ids = {model.initialState: 0};
+            self._state = self._number;
+
+        self.actions = [];
+        self.actionIds = {};
+        for a in model.actions:
+            self._action(a);
+        self.edges = 0;
+
+        self.file = open(self.path, "wb");
+        self._begin();
+
+    def __enter__(self):
+        return self;
+
+    def __exit__(self, *exc):
+        self.close();
+
+    @property
+    def states(self):
+        """
+        Returns the number of states written so far.
+        """
+        if(self.ids is not None):
+            return len(self.ids);
+        return len(self.visited);
+
+    def _action(self, action):
+        """
+        Returns the ID of [action], interning it if needed.
+        """
+        a = self.actionIds.get(action, None);
+        if(a is None):
+            a = self.actionIds[action] = len(self.actions);
+            self.actions.append(action);
+        return a;
+
+    def _number(self, state):
+        """
+        Returns the ID of [state], numbering it if needed.
+        """
+        ids = self.ids;
+        n = ids.get(state, None);
+        if(n is None):
+            n = ids[state] = len(ids);
+        return n;
+
+    def transition(self, src, dst, action, elapsed):
+        self.edges += 1;
+        self._edge(self._state(src), self._action(action), self._state(dst));
+
+    def end(self):
+        self.close();
+
+    def close(self):
+        """
+        Completes the file, if it is still open.
+        """
+        if(self.file is None or self.file.closed):
+            return;
+        try:
+            self._end();
+        finally:
+            self.file.close();
+
+    def _begin(self):
+        """
+        Writes the start of the file.
+        """
+        pass;
+
+    def _edge(self, src, action, dst):
+        """
+        Writes an edge from state ID [src] by action ID [action] to state ID
+         [dst].
+        """
+        raise NotImplementedError;
+
+    def _end(self):
+        """
+        Writes the end of the file.
+        """
+        pass;
+
+class BinaryWriter(Writer):
+    """
+    Binary state graph writer object.
+
+    Writes edges to [path] as fixed-size records, which can be read with
+     `Reader`; if [compress] is set, the records are compressed with zlib.
+    """
+    def __init__(self, path, compress=False, buffer=1 << 16):
+        super().__init__(path);
+        self.compress = compress;
+        self.buffer = buffer;
+
+    def _begin(self):
+        flags = COMPRESSED if self.compress else 0;
+        self.file.write(HEADER.pack(MAGIC, VERSION, flags, 0, 0));
+        self.zlib = zlib.compressobj() if self.compress else None;
+        self.data = bytearray();
+
+    def _write(self, data):
+        if(self.zlib is not None):
+            data = self.zlib.compress(data);
+        self.file.write(data);
+
+    def _edge(self, src, action, dst):
+        data = self.data;
+        data += EDGE.pack(src, action, dst);
+        if(len(data) >= self.buffer):
+            self._write(data);
+            self.data = bytearray();
+
+    def _end(self):
+        names = json.dumps([str(a.id) for a in self.actions]).encode();
+        self.data += struct.pack("<I", len(names)) + names;
+        self._write(self.data);
+        if(self.zlib is not None):
+            self.file.write(self.zlib.flush());
+
+        # fill in the counts
+        self.file.seek(0);
+        flags = COMPRESSED if self.compress else 0;
+        self.file.write(HEADER.pack(MAGIC, VERSION, flags, self.states,
+                                    self.edges));
+
+class AutWriter(Writer):
+    """
+    Aldebaran (.aut) state graph writer object.
+
+    Writes edges to [path] as lines of text, each labelled with the name of
+     its action.
+    """
+    # width of the header line, which is rewritten once the counts are known
+    headerWidth = 48;
+
+    def _header(self, edges, states):
+        return ("des (0, %d, %d)" % (edges, states)).ljust(self.headerWidth);
+
+    def _begin(self):
+        self.file.write((self._header(0, 0) + "\n").encode());
+        self.labels = [];
+
+    def _label(self, action):
+        """
+        Returns the quoted label of the action with ID [action].
+        """
+        labels = self.labels;
+        while len(labels) <= action:
+            name = str(self.actions[len(labels)].id);
+            labels.append('"%s"' % name.replace("\\", "\\\\")
+                                      .replace('"', '\\"'));
+        return labels[action];
+
+    def _edge(self, src, action, dst):
+        self.file.write(("(%d, %s, %d)\n" % (src, self._label(action),
+                                              dst)).encode());
+
+    def _end(self):
+        self.file.seek(0);
+        self.file.write(self._header(self.edges, self.states).encode());
+
+class Reader(object):
+    """
+    Binary state graph reader object.
+
+    Reads a file written by `BinaryWriter` from [path]. Uncompressed files
+     are memory-mapped rather than read. Iterating through this object
+     yields each edge as a tuple of the source state ID, action ID and target
+     state ID; [actions] holds the action names by ID.
+    """
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size);
+            magic, version, flags, self.states, self.edges = \
+                    HEADER.unpack(header);
+            if(magic!=MAGIC or version!=VERSION):
+                raise ValueError("%s is not a state graph file" % path);
+
+            # offset of the records in [data]
+            if(flags & COMPRESSED):
+                self.data = zlib.decompress(f.read());
+                self.offset = 0;
+            else:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ);
+                self.offset = HEADER.size;
+
+        # read the action names after the records
+        off = self.offset + self.edges * EDGE.size;
+        n, = struct.unpack_from("<I", self.data, off);
+        self.actions = json.loads(self.data[off + 4:off + 4 + n]);
+
+    def __len__(self):
+        return self.edges;
+
+    def __getitem__(self, i):
+        if(i < 0):
+            i += self.edges;
+        if(not 0 <= i < self.edges):
+            raise IndexError(i);
+        return EDGE.unpack_from(self.data, self.offset + i * EDGE.size);
+
+    def __iter__(self):
+        return EDGE.iter_unpack(self._records());
+
+    def _records(self):
+        """
+        Returns a view of the edge records.
+        """
+        end = self.offset + self.edges * EDGE.size;
+        return memoryview(self.data)[self.offset:end];
+
+    @property
+    def records(self):
+        """
+        Returns the edge records as a buffer of 32-bit integers, three per
+         edge, without copying them (for example, to wrap in a NumPy array).
+         The integers are little-endian, so this assumes a little-endian
+         machine.
+        """
+        return self._records().cast("I");
@@ -0,0 +1,241 @@
+import array;
+import math;
+
+# Holzmann, G. J. "An Analysis of Bitstate Hashing". Formal Methods in System
+# Design, vol. 13, issue 3 (1998): 289--307.
+
+# Wolper, P.; Leroy, D. "Reliable Hashing without Collision Detection".
+# Lecture Notes in Computer Science, vol. 697 (1993): 59--70.
+
+MASK64 = (1 << 64) - 1;
+
+def _mix(h):
+    """
+    Returns the 64-bit integer [h] scrambled by a splitmix64 step.
+    """
+    h = (h + 0x9e3779b97f4a7c15) & MASK64;
+    h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & MASK64;
+    h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) & MASK64;
+    return h ^ (h >> 31);
+
+def _fold(value, h=0):
+    """
+    Returns [h] combined with a packed state [value].
+    """
+    if(isinstance(value, int)):
+        if(value < 0):
+            value = ~value;
+            h = _mix(h ^ 0x5bd1e995);
+        # every 64 bits of the value, however large, are mixed in
+        while True:
+            h = _mix(h ^ (value & MASK64));
+            value >>= 64;
+            if(value==0):
+                return h;
+    if(isinstance(value, (tuple, list))):
+        h = _mix(h ^ len(value));
+        for v in value:
+            h = _fold(v, h);
+        return h;
+    if(isinstance(value, (bytes, bytearray, memoryview))):
+        return _fold(int.from_bytes(value, "little"), _mix(h ^ len(value)));
+
+    # Python's hash, with at most 61 bits of entropy for numbers
+    return _mix(h ^ (hash(value) & MASK64));
+
+def fingerprint(item):
+    """
+    Returns a 64-bit fingerprint of a state [item], computed from the packed
+     form of the state (see `Model.pack`) if it is a model state, or else
+     from [item] itself. Integers of any size, bytes and tuples of these are
+     mixed in full, so that their fingerprints use all 64 bits; other values
+     are fingerprinted by their Python hash. The fingerprint is the same in
+     every process.
+    """
+    mdl = getattr(item, "model", None);
+    if(mdl is not None):
+        item = mdl.pack(item);
+    return _fold(item);
+
+class HashCompactSet(object):
+    """
+    Hash-compaction state set object.
+
+    Only a 64-bit fingerprint of each state is stored, in an open-addressing
+     table of [size] slots that grows as needed up to [maxSize] slots (8
+     bytes each). Distinct states with equal fingerprints are treated as the
+     same state. Once the table cannot grow, adding a state that would fill
+     it past its maximum load raises an OverflowError. As the states
+     themselves are not kept, only `add`, `in` and `len` are supported.
+    """
+    bits = 64;
+
+    # fraction of the slots that may be used in a table that cannot grow
+    maxLoad = 0.9;
+
+    def __init__(self, size=1 << 16, maxSize=1 << 26):
+        size = 1 << max(size - 1, 1).bit_length();
+        self.maxSize = 1 << max(maxSize - 1, 1).bit_length();
+        size = min(size, self.maxSize);
+        self.table = array.array("Q", bytes(8 * size));
+        self.count = 0;
+
+    def __repr__(self):
+        return "HashCompactSet(%d states, %d bytes, omission %.3g)" \
+                % (self.count, self.memory, self.omission);
+
+    def __len__(self):
+        return self.count;
+
+    def __iter__(self):
+        raise TypeError("%s cannot enumerate its states"
+                        % type(self).__name__);
+
+    @property
+    def memory(self):
+        """
+        Returns the size of the table in bytes.
+        """
+        return len(self.table) * self.table.itemsize;
+
+    @property
+    def omission(self):
+        """
+        Returns the estimated probability that at least one state was
+         omitted due to a fingerprint collision, assuming fingerprints are
+         uniform over 64 bits (see `fingerprint`).
+        """
+        n = self.count;
+        return -math.expm1(-n * (n - 1) / 2**(self.bits + 1));
+
+    def _find(self, fp):
+        """
+        Returns the slot for fingerprint [fp]: either the slot holding it or
+         the empty slot where it would be inserted.
+        """
+        table = self.table;
+        mask = len(table) - 1;
+        i = fp & mask;
+        while True:
+            v = table[i];
+            if(v==fp or v==0):
+                return i;
+            i = (i + 1) & mask;
+
+    def _grow(self):
+        """
+        Doubles the size of the table.
+        """
+        old = self.table;
+        self.table = array.array("Q", bytes(16 * len(old)));
+        for fp in old:
+            if(fp!=0):
+                self.table[self._find(fp)] = fp;
+
+    def __contains__(self, item):
+        fp = fingerprint(item) or 1;
+        return self.table[self._find(fp)]==fp;
+
+    def add(self, item):
+        """
+        Add a given state [item] to this set.
+        """
+        fp = fingerprint(item) or 1;
+        i = self._find(fp);
+        if(self.table[i]==fp):
+            return;
+
+        size = len(self.table);
+        if(size==self.maxSize and self.count + 1 > self.maxLoad * size):
+            raise OverflowError("HashCompactSet is full (%d states in %d "
+                                "bytes)" % (self.count, self.memory));
+
+        self.table[i] = fp;
+        self.count += 1;
+        if(4 * self.count >= 3 * size and size < self.maxSize):
+            self._grow();
+
+class BitStateSet(object):
+    """
+    Bitstate (supertrace) state set object.
+
+    Each state sets [k] bits in a fixed array of [bits] bits; a state is
+     considered visited if all of its bits are set. As the states themselves
+     are not kept, only `add`, `in` and `len` are supported.
+    """
+    def __init__(self, bits=1 << 27, k=3):
+        bits = 1 << max(bits - 1, 8).bit_length();
+        self.data = bytearray(bits // 8);
+        self.mask = bits - 1;
+        self.k = k;
+
+        self.count = 0;
+        self.set = 0;
+        # log of the probability that no state has been omitted so far
+        self.kept = 0.0;
+
+    def __repr__(self):
+        return "BitStateSet(%d states, %d bytes, omission %.3g)" \
+                % (self.count, self.memory, self.omission);
+
+    def __len__(self):
+        return self.count;
+
+    def __iter__(self):
+        raise TypeError("%s cannot enumerate its states"
+                        % type(self).__name__);
+
+    @property
+    def memory(self):
+        """
+        Returns the size of the bit array in bytes.
+        """
+        return len(self.data);
+
+    @property
+    def falsePositive(self):
+        """
+        Returns the estimated probability that the next new state is wrongly
+         considered visited, given the current fill ratio of the array.
+        """
+        return (self.set / (self.mask + 1))**self.k;
+
+    @property
+    def omission(self):
+        """
+        Returns the estimated probability that at least one state was
+         omitted so far, accumulated over the false positive probability at
+         the time each state was added.
+        """
+        return -math.expm1(self.kept);
+
+    def _bits(self, item):
+        """
+        Returns the [k] bit positions for a given state [item].
+        """
+        h1 = fingerprint(item);
+        h2 = fingerprint(h1) | 1;
+        mask = self.mask;
+        return [(h1 + j * h2) & mask for j in range(self.k)];
+
+    def __contains__(self, item):
+        data = self.data;
+        return all(data[b >> 3] & (1 << (b & 7)) for b in self._bits(item));
+
+    def add(self, item):
+        """
+        Add a given state [item] to this set.
+        """
+        data = self.data;
+        p = self.falsePositive;
+        new = 0;
+        for b in self._bits(item):
+            i, m = b >> 3, 1 << (b & 7);
+            if(not data[i] & m):
+                data[i] |= m;
+                new += 1;
+
+        if(new > 0):
+            self.set += new;
+            self.count += 1;
+            self.kept += math.log1p(-p) if p < 1 else -math.inf;
@@ -0,0 +1,244 @@
+import json;
+import os;
+import resource;
+import time;
+
+def rss():
+    """
+    Returns the resident set size of this process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE");
+    except (OSError, ValueError):
+        # peak instead of current RSS; kilobytes on Linux, bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;
+        return rss * 1024 if os.uname().sysname!="Darwin" else rss;
+
+class Observer(object):
+    """
+    Abstract exploration observer object.
+
+    An observer passed to an exploration (such as `Model.reach`) is notified
+     of the exploration's progress through the functions below; without an
+     observer, the exploration runs without any instrumentation. If
+     [byAction] is set, the time of each transition should reflect its
+     action (see `Model.timedNextStates`).
+    """
+    byAction = False;
+
+    def begin(self, model, visited):
+        """
+        Called when the exploration of [model] starts, with the set of
+         [visited] states it uses.
+        """
+        pass;
+
+    def visit(self, state, action, new, elapsed):
+        """
+        Called when a [state], reached by [action], is looked up in the
+         visited set; [new] tells whether it was not yet visited, and
+         [elapsed] is the time taken by the lookup (and insertion).
+        """
+        pass;
+
+    def transition(self, src, dst, action, elapsed):
+        """
+        Called for each transition from [src] to [dst] by [action] that
+         `nextStates` generates, where [elapsed] is the time taken to
+         generate it.
+        """
+        pass;
+
+    def idle(self, action, elapsed):
+        """
+        Called when [elapsed] seconds were spent generating the successors
+         of an [action] that had none, if the model times actions separately
+         (see [byAction]).
+        """
+        pass;
+
+    def expand(self, state, succ, depth):
+        """
+        Called when all [succ] successors of [state] have been generated,
+         where [depth] is the size of the stack or frontier.
+        """
+        pass;
+
+    def timing(self, kind, elapsed):
+        """
+        Called when [elapsed] seconds were spent on other work of a given
+         [kind], such as "labels".
+        """
+        pass;
+
+    def end(self):
+        """
+        Called when the exploration has finished.
+        """
+        pass;
+
+class Metrics(Observer):
+    """
+    Observer object that takes snapshots of exploration metrics every
+     [interval] seconds, and once when the exploration ends. Snapshots are
+     kept in [snapshots], and written to [stream] as JSON lines if given.
+    """
+    def __init__(self, stream=None, interval=1.0):
+        self.stream = stream;
+        self.interval = interval;
+        self.snapshots = [];
+
+    def begin(self, model, visited):
+        self.model = model;
+        self.visited = visited;
+
+        self.states = 0;
+        self.transitions = 0;
+        self.depth = 0;
+        self.times = {"nextStates": 0.0, "labels": 0.0, "hashing": 0.0};
+
+        self.start = self.last = time.perf_counter();
+        self.lastStates = self.lastTransitions = 0;
+
+    def visit(self, state, action, new, elapsed):
+        self.times["hashing"] += elapsed;
+        if(not new):
+            return;
+
+        self.states += 1;
+        if((self.states & 0x3ff)==0
+           and time.perf_counter() - self.last >= self.interval):
+            self.snapshot();
+
+    def transition(self, src, dst, action, elapsed):
+        self.transitions += 1;
+        self.times["nextStates"] += elapsed;
+
+    def idle(self, action, elapsed):
+        self.times["nextStates"] += elapsed;
+
+    def expand(self, state, succ, depth):
+        self.depth = depth;
+
+    def timing(self, kind, elapsed):
+        self.times[kind] = self.times.get(kind, 0.0) + elapsed;
+
+    def end(self):
+        self.snapshot();
+
+    def snapshot(self):
+        """
+        Take a snapshot of the current metrics.
+        Returns the snapshot as a dict.
+        """
+        now = time.perf_counter();
+        dt = (now - self.last) or 1e-9;
+
+        snap = {
+            "model": self.model.name,
+            "time": now - self.start,
+            "states": self.states,
+            "transitions": self.transitions,
+            "statesPerSec": (self.states - self.lastStates) / dt,
+            "transitionsPerSec": (self.transitions - self.lastTransitions) / dt,
+            "visited": len(self.visited),
+            "depth": self.depth,
+            "rss": rss(),
+        };
+        snap.update(self.times);
+
+        self.last = now;
+        self.lastStates = self.states;
+        self.lastTransitions = self.transitions;
+
+        self.snapshots.append(snap);
+        if(self.stream is not None):
+            self.stream.write(json.dumps(snap) + "\n");
+            self.stream.flush();
+
+        return snap;
+
+class Profile(Observer):
+    """
+    Observer object that attributes the work of an exploration to actions:
+     for each action, the number of transitions it fired, the time spent
+     generating them, and how many of the successors were new or already
+     visited. The time of a transition is measured from the previous one,
+     so it includes evaluating the guards that did not fire before it,
+     unless the model times each action separately, in which case actions
+     are also charged for the time they took without firing. For
+     models that can only generate all successors of a state at once (see
+     `Model.batched`), no times are reported.
+    """
+    byAction = True;
+
+    def __init__(self):
+        # per action, a list [fired, time, new, duplicate]
+        self.actions = {};
+        self.timed = True;
+
+    def begin(self, model, visited):
+        self.timed = not model.batched;
+
+    def _stats(self, action):
+        stats = self.actions.get(action, None);
+        if(stats is None):
+            stats = self.actions[action] = [0, 0.0, 0, 0];
+        return stats;
+
+    def transition(self, src, dst, action, elapsed):
+        stats = self._stats(action);
+        stats[0] += 1;
+        stats[1] += elapsed;
+
+    def idle(self, action, elapsed):
+        self._stats(action)[1] += elapsed;
+
+    def visit(self, state, action, new, elapsed):
+        if(action is None):
+            return;
+        self._stats(action)[2 if new else 3] += 1;
+
+    def report(self, key="time"):
+        """
+        Returns a report of the collected statistics, as a list of dicts
+         sorted in descending order of [key] ("fired", "time", "new" or
+         "duplicate"). If the model's transitions could not be timed, time
+         is None, and the report is sorted by "fired" instead of "time".
+        """
+        rows = [{"action": a.id, "fired": f,
+                 "time": t if self.timed else None, "new": n, "duplicate": d}
+                for a, (f, t, n, d) in self.actions.items()];
+        if(key=="time" and not self.timed):
+            key = "fired";
+        rows.sort(key=lambda r: r[key], reverse=True);
+        return rows;
+
+    def format(self, key="time"):
+        """
+        Returns the report sorted by [key] as a table.
+        """
+        rows = self.report(key);
+        if(not self.timed):
+            lines = ["%-24s %10s %10s %8s" % ("action", "fired", "new",
+                                              "dup%")];
+            for r in rows:
+                fired = r["fired"] or 1;
+                lines.append("%-24s %10d %10d %7.1f%%"
+                             % (r["action"], r["fired"], r["new"],
+                                100 * r["duplicate"] / fired));
+            return "\n".join(lines);
+
+        total = sum(r["time"] for r in rows) or 1e-9;
+
+        lines = ["%-24s %10s %10s %7s %10s %10s %8s" % ("action", "fired",
+                 "seconds", "%time", "us/trans", "new", "dup%")];
+        for r in rows:
+            fired = r["fired"] or 1;
+            lines.append("%-24s %10d %10.3f %6.1f%% %10.2f %10d %7.1f%%"
+                         % (r["action"], r["fired"], r["time"],
+                            100 * r["time"] / total, 1e6 * r["time"] / fired,
+                            r["new"], 100 * r["duplicate"] / fired));
+
+        return "\n".join(lines);
@@ -1,11 +1,15 @@
 import itertools;
+import time;
 
+from .search import BFS;
 from .util import cached_property;
 
 class State(object):
     """
     Abstract state object.
     """
+    __slots__ = ["model"];
+
     def __init__(self, model):
         self.model = model;
 
@@ -176,6 +180,27 @@ class Action(object):
         for lbl in self.enables:
             lbl.cost += diff;
 
+class Violation(object):
+    """
+    Violation of the property [name] in a [state], with an optional [trace]
+     leading to it as returned by `search.BFS.trace`.
+    """
+    def __init__(self, name, state, trace=None):
+        self.name = name;
+        self.state = state;
+        self.trace = trace;
+
+    def __repr__(self):
+        return "Violation(%s, %s)" % (repr(self.name), repr(self.state));
+
+def atMost(n, labels):
+    """
+    Returns an invariant that holds in states in which at most [n] of the
+     given state [labels] hold.
+    """
+    labels = frozenset(labels);
+    return lambda s: len(labels.intersection(s.labels)) <= n;
+
 class Model(object):
     """
     Abstract model object.
@@ -185,6 +210,10 @@ class Model(object):
 
     StateSet = set;
 
+    # whether nextStates generates all successors of a state at once, so that
+    #  the time of a transition does not reflect its action
+    batched = False;
+
     def __init__(self):
         self.actions = self.Actions(self, Action);
         self.labels = self.Labels(self, StateLabel);
@@ -273,6 +302,42 @@ class Model(object):
         """
         raise NotImplementedError;
 
+    def timedNextStates(self, src, byAction=False, idle=None):
+        """
+        Returns for each successor state of [src] a tuple consisting of the
+         state object, the action used to get there, and the time taken to
+         generate it, measured from the previous successor. If [byAction] is
+         set, a model that generates successors in batches may generate them
+         per action instead, so that the time reflects the action; it then
+         reports the time spent on actions without successors by calling
+         idle(action, elapsed) if given.
+        """
+        clock = time.perf_counter;
+        t = clock();
+        for s, a in self.nextStates(src):
+            yield (s, a, clock() - t);
+            t = clock();
+
+    def canonical(self, state):
+        """
+        Returns the representative of the symmetry class of [state]. By
+         default, a model has no symmetries.
+        """
+        return state;
+
+    def pack(self, state):
+        """
+        Returns a compact, picklable form of [state], which [unpack] converts
+         back into a state.
+        """
+        return tuple(state);
+
+    def unpack(self, data):
+        """
+        Returns the state for a packed form [data] created by [pack].
+        """
+        raise NotImplementedError;
+
     def enabled(self, src):
         """
         Returns a tuple consisting of the set of all enabled actions from
@@ -314,13 +379,20 @@ class Model(object):
 
         return stubborn.intersection(en);
 
-    def reach(self, dead=None, live=None):
+    def reach(self, dead=None, live=None, visited=None, observer=None):
         """
         Iterate through reachable statespace. Adds deadlock states to [dead],
-         and livelock states to [live].
+         and livelock states to [live]. Visited states are kept in [visited],
+         or in a new [StateSet] if not given. The exploration is reported to
+         an [observer] (see `metrics.Observer`) if given.
         Returns each reachable state.
         """
-        visited = self.StateSet();
+        if(visited is None):
+            visited = self.StateSet();
+        if(observer is not None):
+            yield from self._reachObserved(dead, live, visited, observer);
+            return;
+
         stack = [self.initialState];
         while stack:
             cur = stack.pop();
@@ -343,3 +415,176 @@ class Model(object):
             if(cur is not None):
                 visited.add(cur);
                 yield cur;
+
+    def _reachObserved(self, dead, live, visited, observer):
+        """
+        Version of [reach] that reports to an [observer]. States are added to
+         [visited] as soon as they are generated, before the transition to
+         them is reported, so that an observer can look them up. The
+         observer's end function is called even if the exploration is not
+         run to completion.
+        """
+        clock = time.perf_counter;
+        observer.begin(self, visited);
+        byAction = getattr(observer, "byAction", False);
+        idle = getattr(observer, "idle", None);
+
+        try:
+            init = self.initialState;
+            t = clock();
+            if(init is not None):
+                visited.add(init);
+            observer.visit(init, None, True, clock() - t);
+
+            stack = [init];
+            while stack:
+                cur = stack.pop();
+
+                # visit all successor states, timing each
+                succ, last = 0, None;
+                for i, a, dt in self.timedNextStates(cur, byAction, idle):
+                    t = clock();
+                    new = i not in visited;
+                    if(new and i is not None):
+                        visited.add(i);
+                    lookup = clock() - t;
+
+                    observer.transition(cur, i, a, dt);
+                    observer.visit(i, a, new, lookup);
+                    if(new):
+                        stack.append(i);
+                    succ += 1;
+                    last = i;
+                observer.expand(cur, succ, len(stack));
+
+                # record dead- and livelocks
+                if(dead is not None and succ==0):
+                    dead.add(cur);
+                if(live is not None and succ==1 and last==cur):
+                    live.add(cur);
+
+                if(cur is not None):
+                    yield cur;
+        finally:
+            observer.end();
+
+    def dfs(self, dead=None, live=None, visited=None):
+        """
+        Iterate through reachable statespace depth-first, keeping a lazy
+         successor iterator for each state on the stack. States are marked
+         visited as soon as they are generated, so the stack is bounded by
+         the search depth. Adds deadlock states to [dead], and states on a
+         cycle of states with only one successor (such as a self-loop) to
+         [live]; both are complete once the search has finished. Visited
+         states are kept in [visited], or in a new [StateSet] if not given.
+        Returns each reachable state.
+        """
+        if(visited is None):
+            visited = self.StateSet();
+
+        init = self.initialState;
+        if(init is not None):
+            visited.add(init);
+            yield init;
+
+        # stack frames are [state, successors, successor count, cycle]; if the
+        #  only successor leads back into the stack, cycle is a tuple of the
+        #  depth it leads to and the states in between
+        depth = {init: 0};
+        stack = [[init, iter(self.nextStates(init)), 0, None]];
+        while stack:
+            frame = stack[-1];
+            for s, _ in frame[1]:
+                frame[2] += 1;
+                frame[3] = None;
+                if(s in depth):
+                    # back edge (or self-loop) into the stack
+                    frame[3] = (depth[s], []);
+                elif(s not in visited):
+                    visited.add(s);
+                    yield s;
+
+                    depth[s] = len(stack);
+                    stack.append([s, iter(self.nextStates(s)), 0, None]);
+                    break;
+            else:
+                # all successors have been explored
+                stack.pop();
+                cur, _, succ, cycle = frame;
+                del depth[cur];
+
+                if(dead is not None and succ==0):
+                    dead.add(cur);
+                if(live is None or succ!=1 or cycle is None):
+                    continue;
+
+                low, chain = cycle;
+                chain.append(cur);
+                if(low==len(stack)):
+                    # the cycle closes at this state
+                    live.update(chain);
+                else:
+                    # parent's only successor (so far) is this state
+                    stack[-1][3] = cycle;
+
+    def bfs(self, dead=None, live=None, observer=None):
+        """
+        Returns a breadth-first search object for this model; iterating it
+         yields each reachable state, adding deadlock states to [dead] and
+         livelock states to [live], and reporting to [observer] if given.
+         See `search.BFS`.
+        """
+        return BFS(self, dead, live, observer);
+
+    def counterexample(self, pred):
+        """
+        Returns a shortest trace to a reachable state for which [pred] holds,
+         as a list of tuples (action, state),
+         or None if no such state is reachable.
+        """
+        search = self.bfs();
+        for s in search:
+            if(pred(s)):
+                return search.trace(s);
+
+        return None;
+
+    def check(self, invariants=None, deadlock=True, trace=False,
+              observer=None):
+        """
+        Checks that all [invariants], a dict of names to predicates over
+         states, hold in every reachable state, and if [deadlock] is set, that
+         there are no deadlocks, in a single exploration that stops at the
+         first violation. Deadlocks are detected from the successor count of
+         the exploration itself. If [trace] is set, the exploration is
+         breadth-first and the violation includes a shortest trace. The
+         exploration is reported to an [observer] if given, including the
+         time spent evaluating invariants as "labels".
+        Returns the Violation,
+         or None if no violation is reachable.
+        """
+        invariants = invariants or {};
+        dead = set() if deadlock else None;
+        if(trace):
+            search = self.bfs(dead, observer=observer);
+        else:
+            search = self.reach(dead, observer=observer);
+
+        for s in search:
+            name = None;
+            if(dead):
+                # the search records a deadlock just before yielding it
+                name = "deadlock";
+            else:
+                t = time.perf_counter();
+                for n, pred in invariants.items():
+                    if(not pred(s)):
+                        name = n;
+                        break;
+                if(observer is not None):
+                    observer.timing("labels", time.perf_counter() - t);
+
+            if(name is not None):
+                return Violation(name, s, search.trace(s) if trace else None);
+
+        return None;
@@ -0,0 +1,250 @@
+import multiprocessing;
+import os;
+import queue;
+import traceback;
+
+from .hashset import fingerprint;
+
+def _owner(data, workers):
+    """
+    Returns the index of the worker owning a packed state [data].
+    """
+    return fingerprint(data) % workers;
+
+def _worker(index, factory, args, inboxes, results, pending, stop, batch,
+            collect):
+    """
+    Worker process [index] of a parallel exploration. Creates its own model
+     using [factory] and explores the states it owns; successors owned by
+     other workers are sent to their inbox in batches of [batch]. Once the
+     shared flag [stop] is set, remaining work is skipped.
+    """
+    workers = len(inboxes);
+    inbox = inboxes[index];
+    states = transitions = deadlocks = 0;
+    try:
+        mdl = factory(*args);
+        visited = mdl.StateSet();
+
+        out = [[] for _ in range(workers)];
+        found, dead, live = [], [], [];
+
+        def send(i):
+            with pending.get_lock():
+                pending.value += 1;
+            inboxes[i].put(out[i]);
+            out[i] = [];
+
+        def explore(work):
+            nonlocal states, transitions, deadlocks, found, dead, live;
+            stack = list(work);
+            while stack:
+                if((states & 0x3ff)==0 and stop.value):
+                    return;
+                data = stack.pop();
+                cur = mdl.unpack(data);
+                if(cur in visited):
+                    continue;
+                visited.add(cur);
+                states += 1;
+
+                # distribute successor states to their owners
+                succ, last = 0, None;
+                for s, _ in mdl.nextStates(cur):
+                    succ += 1;
+                    last = s;
+                    p = mdl.pack(s);
+                    i = _owner(p, workers);
+                    if(i==index):
+                        stack.append(p);
+                        continue;
+
+                    out[i].append(p);
+                    if(len(out[i]) >= batch):
+                        send(i);
+
+                transitions += succ;
+                if(succ==0):
+                    deadlocks += 1;
+                    dead.append(data);
+                elif(succ==1 and last==cur):
+                    live.append(data);
+
+                if(collect):
+                    found.append(data);
+                    if(len(found) >= batch):
+                        results.put(("states", found, [], []));
+                        found = [];
+
+            for i in range(workers):
+                if(out[i]):
+                    send(i);
+
+            if(found or dead or live):
+                results.put(("states", found, dead, live));
+                found, dead, live = [], [], [];
+
+            # the last worker to finish its batch signals termination
+            with pending.get_lock():
+                pending.value -= 1;
+                done = (pending.value==0);
+            if(done):
+                results.put(("done",));
+
+        init = mdl.pack(mdl.initialState);
+        if(_owner(init, workers)==index):
+            explore([init]);
+
+        while True:
+            work = inbox.get();
+            if(work is None):
+                break;
+            if(not stop.value):
+                explore(work);
+    except Exception:
+        stop.value = 1;
+        results.put(("error", index, traceback.format_exc()));
+        # keep taking batches until told to stop, so that their senders
+        #  are not left blocked on a full inbox
+        while inbox.get() is not None:
+            pass;
+
+    # every batch has been explored unless the exploration failed, in which
+    #  case batches still queued for other workers may be dropped
+    for q in inboxes:
+        q.cancel_join_thread();
+    results.put(("counts", index, states, transitions, deadlocks));
+
+class Reach(object):
+    """
+    Parallel reachability object.
+
+    Explores the model created by calling [factory] with [args] using
+     [workers] processes. Each worker creates its own model, and owns the
+     states whose packed form (see `Model.pack`) hashes to it; states are
+     exchanged between workers in batches of [batch]. Packed states must
+     hash consistently across processes, which holds for integers and
+     tuples of integers.
+    """
+    # seconds to wait for a message before checking that workers are alive
+    poll = 1.0;
+
+    def __init__(self, factory, *args, workers=None, batch=1024,
+                 context="spawn"):
+        self.factory = factory;
+        self.args = args;
+        self.workers = workers or os.cpu_count();
+        self.batch = batch;
+        self.context = multiprocessing.get_context(context);
+
+        self.model = None;
+
+        # aggregate counts, available after exploration
+        self.states = 0;
+        self.transitions = 0;
+        self.deadlocks = 0;
+
+    def _run(self, collect):
+        """
+        Runs the workers and returns each message they send, other than
+         their final counts. Raises a RuntimeError if a worker fails or dies.
+        """
+        ctx = self.context;
+        inboxes = [ctx.Queue() for _ in range(self.workers)];
+        results = ctx.Queue();
+
+        # number of batches that are queued or being explored
+        pending = ctx.Value("q", 1);
+        # set when the exploration fails, so that workers skip their work
+        stop = ctx.RawValue("b", 0);
+
+        procs = [ctx.Process(target=_worker,
+                             args=(i, self.factory, self.args, inboxes,
+                                   results, pending, stop, self.batch,
+                                   collect))
+                 for i in range(self.workers)];
+        for p in procs:
+            p.start();
+
+        self.states = self.transitions = self.deadlocks = 0;
+        errors = [];
+        finished = set();
+        # workers found to have exited without sending their counts; they
+        #  are only considered dead if they still have not once the queue is
+        #  empty again, as their last messages may be in transit
+        exited = set();
+        try:
+            while len(finished) < self.workers:
+                try:
+                    msg = results.get(timeout=self.poll);
+                except queue.Empty:
+                    dead = {i for i, p in enumerate(procs)
+                            if p.exitcode is not None and i not in finished};
+                    if(dead & exited):
+                        i = min(dead & exited);
+                        errors.append("worker %d died with exit code %d"
+                                      % (i, procs[i].exitcode));
+                        stop.value = 1;
+                        break;
+                    exited = dead;
+                    continue;
+
+                if(msg[0]=="done" or msg[0]=="error"):
+                    if(msg[0]=="error"):
+                        stop.value = 1;
+                        errors.append(msg[2]);
+                    for inbox in inboxes:
+                        inbox.put(None);
+                elif(msg[0]=="counts"):
+                    finished.add(msg[1]);
+                    self.states += msg[2];
+                    self.transitions += msg[3];
+                    self.deadlocks += msg[4];
+                else:
+                    yield msg;
+        finally:
+            if(errors or len(finished) < self.workers):
+                # stopped early: the remaining workers and queued batches are
+                #  abandoned
+                for inbox in inboxes:
+                    inbox.cancel_join_thread();
+                for p in procs:
+                    p.terminate();
+            for p in procs:
+                p.join();
+
+        if(errors):
+            raise RuntimeError("worker failed:\n" + errors[0]);
+
+    def run(self, callback=None):
+        """
+        Explores the reachable statespace, calling [callback] for each
+         reachable state if given.
+        Returns a tuple of the number of states, transitions and deadlocks.
+        """
+        if(callback is None):
+            for _ in self._run(False):
+                pass;
+        else:
+            for s in self.reach():
+                callback(s);
+
+        return (self.states, self.transitions, self.deadlocks);
+
+    def reach(self, dead=None, live=None):
+        """
+        Iterate through reachable statespace. Adds deadlock states to [dead],
+         and livelock states to [live].
+        Returns each reachable state, in no particular order.
+        """
+        if(self.model is None):
+            self.model = self.factory(*self.args);
+        mdl = self.model;
+
+        for _, found, d, l in self._run(True):
+            if(dead is not None):
+                dead.update(mdl.unpack(s) for s in d);
+            if(live is not None):
+                live.update(mdl.unpack(s) for s in l);
+            for s in found:
+                yield mdl.unpack(s);
@@ -1,21 +1,25 @@
+import collections;
+import ctypes as C;
+import operator;
+import time;
+
 from .. import model;
 from .. import slotState;
-from ..util import cached_property;
+from ..util import bits, cached_property;
 
 from . import pins;
-from . import callback;
 
 class State(slotState.SlotState):
     """
     State object for PINS-based model.
     """
     def __init__(self, model, data=None):
-        mdl = model.model;
-        assert(isinstance(data, mdl.stateType));
-        super().__init__(model, mdl.stateSlots, data);
+        assert(isinstance(data, model.model.stateType)
+               or model.layout.arena is not None);
+        super().__init__(model, model.layout, data);
 
     def __hash__(self):
-        return hash(tuple(self.slots[:]));
+        return hash(bytes(self.slots));
 
     def __eq__(self, other):
         return self.slots[:]==other.slots[:];
@@ -25,24 +29,162 @@ class State(slotState.SlotState):
         """
         Returns a set of all state labels applicable in this state.
         """
-        labels = self.model.model.getStateLabels(self.slots);
+        labels = self.model.model.getStateLabels(self.model._cState(self));
         return {self.model._labels[i] for i in labels};
 
+class TransitionCache(object):
+    """
+    Transition cache object.
+
+    Caches the successors of each transition group of a PINS [model] by the
+     projection of the source state onto the slots that the group reads or
+     may, but need not, write. For each successor only the values of the
+     slots the group may write are stored, so that the successors of any
+     state with the same projection are found by applying these values to a
+     copy of it, without calling the library. At most [size] projections
+     are kept; the least recently used one is evicted first.
+    """
+    def __init__(self, model, size=1 << 16):
+        mdl = model.model;
+        read = mdl.matrices.get("actionRead", None);
+        mayWrite = mdl.matrices.get("actionMayWrite", None);
+        mustWrite = mdl.matrices.get("actionMustWrite", None);
+        if(read is None or (mayWrite is None and mustWrite is None)):
+            raise ValueError("%s has no read and write dependency matrices"
+                             % model.name);
+
+        def rows(mtx):
+            return mtx.rows if mtx is not None else [0] * mdl.actionCount;
+
+        reads, may, must = rows(read), rows(mayWrite), rows(mustWrite);
+
+        self.model = model;
+        self.size = size;
+        # projection function and written slots by group
+        self.keys = [];
+        self.writes = [];
+        for g in range(mdl.actionCount):
+            key = list(bits(reads[g] | (may[g] & ~must[g])));
+            if(key):
+                self.keys.append(operator.itemgetter(*key));
+            else:
+                self.keys.append(lambda slots: ());
+            self.writes.append(tuple(bits(may[g] | must[g])));
+
+        # successor values of the written slots by (group, projection)
+        self.entries = collections.OrderedDict();
+        self.hits = 0;
+        self.misses = 0;
+        self.evictions = 0;
+
+    def __len__(self):
+        return len(self.entries);
+
+    @property
+    def hitRate(self):
+        """
+        Returns the fraction of lookups that were found in the cache.
+        """
+        return self.hits / ((self.hits + self.misses) or 1);
+
+    def _fill(self, src, missing):
+        """
+        Calls the library for the successors of [src] in each group of the
+         (group, key) pairs in [missing], and caches them under their key.
+        """
+        mdl = self.model;
+        cSrc = mdl._cState(src);
+        n = len(mdl.layout);
+        found = {g: [] for g, _ in missing};
+        if(len(missing)==1 or mdl.model._nextStateLong is not None):
+            calls = [g for g, _ in missing];
+        else:
+            # one call for all groups is cheaper than filtering it per group
+            calls = [None];
+
+        for group in calls:
+            states, groups = mdl.model.successors(cSrc, group);
+            for i, g in enumerate(groups):
+                if(g in found):
+                    row = states[i * n:(i + 1) * n];
+                    found[g].append(tuple(row[j] for j in self.writes[g]));
+
+        entries = self.entries;
+        for g, key in missing:
+            entries[key] = found[g];
+        while len(entries) > self.size:
+            entries.popitem(last=False);
+            self.evictions += 1;
+
+        return found;
+
+    def successors(self, src, groups):
+        """
+        Returns a list of tuples consisting of each successor state of [src]
+         in the given [groups] and the action used to get there.
+        """
+        slots = src.slots;
+        entries, keys = self.entries, self.keys;
+
+        values = [];
+        missing = [];
+        for g in groups:
+            key = (g, keys[g](slots));
+            v = entries.get(key, None);
+            if(v is None):
+                missing.append((g, key));
+            else:
+                entries.move_to_end(key);
+                values.append((g, v));
+
+        self.hits += len(values);
+        self.misses += len(missing);
+        if(missing):
+            values.extend(self._fill(src, missing).items());
+
+        # apply the cached values to copies of the source state
+        mdl = self.model;
+        arena, acts = mdl.layout.arena, mdl._actions;
+        if(arena is not None):
+            copy = arena.copy;
+        else:
+            copy = mdl.model.stateType.from_buffer_copy;
+
+        succ = [];
+        for g, v in values:
+            writes = self.writes[g];
+            for d in v:
+                data = copy(slots);
+                for j, x in zip(writes, d):
+                    data[j] = x;
+                succ.append((State(mdl, data), acts[g]));
+
+        return succ;
+
 class Model(model.Model):
     """
     PINS-based model object.
     """
-    def __init__(self, lib):
+    def __init__(self, lib, arena=False, cache=0):
         """
-        Create a PINS model from a library [lib].
+        Create a PINS model from a library [lib]. If [arena] is set, the
+         slots of states are kept in an arena (see `slotState.Arena`), and
+         passed to the library without conversion. If [cache] is set,
+         successors are generated through a transition cache (see
+         `TransitionCache`) of that many entries, which requires the library
+         to provide read and write dependency matrices.
         """
         super().__init__();
         mdl = pins.Model(lib);
 
         self.name = mdl.wrapper.name;
         self.model = mdl;
+        self.layout = slotState.Layout(mdl.stateSlots, arena);
 
-        self.initialState = State(self, mdl.initialState);
+        init = mdl.initialState;
+        if(arena):
+            init = self.layout.arena.new(init);
+        self.initialState = State(self, init);
         # create actions and state labels
         self._actions = [None] * mdl.actionCount;
         acts = self._actions;
@@ -77,37 +219,157 @@ class Model(model.Model):
             "guardTest":       (lbls, slots, "tests",    None),
         };
 
-        # create empty sets
+        # create empty sets, and their bitsets (for example, readsBits) over
+        #  the indices of the group, label or slot of each member
         for type, (rows, cols, rowSet, colSet) in matrices.items():
             if(rowSet):
                 for r in rows:
                     setattr(r, rowSet, set());
+                    setattr(r, rowSet + "Bits", 0);
             if(colSet and rows!=cols):
                 for c in cols:
                     setattr(c, colSet, set());
+                    setattr(c, colSet + "Bits", 0);
 
-        # fill sets
+        # fill sets from the rows and columns of each matrix
         for type, (rows, cols, rowSet, colSet) in matrices.items():
             mtx = mdl.matrices.get(type, None);
             if(mtx is None):
                 continue;
             assert(mtx.n==len(rows) and mtx.m==len(cols));
 
-            for i, j in mtx:
-                io, jo = rows[i], cols[j];
-                if(rowSet):
-                    getattr(io, rowSet).add(jo);
-                if(colSet):
-                    getattr(jo, colSet).add(io);
+            sets = [(rowSet, rows, cols, mtx.rows), (colSet, cols, rows,
+                                                     mtx.cols)];
+            for name, objs, members, bitsets in sets:
+                if(not name):
+                    continue;
+                for o, b in zip(objs, bitsets):
+                    if(b):
+                        getattr(o, name).update(members[k] for k in bits(b));
+                        setattr(o, name + "Bits", getattr(o, name + "Bits") | b);
+
+        self.cache = TransitionCache(self, cache) if cache else None;
+
+    def explore(self, deadlock=True, labels=(), violation=None,
+                progress=None, interval=1 << 16, sample=None, rate=0):
+        """
+        Explores the reachable statespace in native code, without creating
+         state objects, checking for deadlocks if [deadlock] is set and that
+         none of the given state [labels] hold. Calls back into Python only
+         for violations, progress and samples:
+         - violation(name, state) for each violation, where name is
+           "deadlock" or the state label that holds; if it returns a true
+           value, the exploration stops.
+         - progress(states, transitions) every [interval] states.
+         - sample(state) every [rate] states.
+        Returns a tuple of the number of states, transitions, deadlocks and
+         violations.
+        """
+        arena = self.layout.arena;
+        def state(data):
+            if(arena is not None):
+                data = arena.new(data);
+            return State(self, data);
+
+        def callback(kind, data, label, states, transitions):
+            if(kind=="progress"):
+                progress(states, transitions);
+            elif(kind=="sample"):
+                sample(state(data));
+            elif(violation is not None):
+                name = "deadlock" if kind=="deadlock" else self._labels[label];
+                return violation(name, state(data));
+            return False;
+
+        ids = {l: i for i, l in enumerate(self._labels)};
+        return self.model.explore(callback, deadlock, [ids[l] for l in labels],
+                                  interval if progress is not None else 0,
+                                  rate if sample is not None else 0);
+
+    def unpack(self, data):
+        """
+        Returns the state for a packed form [data].
+        """
+        if(self.layout.arena is not None):
+            return State(self, self.layout.arena.new(data));
+        return State(self, self.model.stateType(*data));
+
+    def _cState(self, state):
+        """
+        Returns the slots of [state] as an array of the library's state type,
+         sharing memory with the state.
+        """
+        if(self.layout.arena is None):
+            return state.slots;
+        return self.model.stateType.from_buffer(state.slots);
+
+    @property
+    def _groupTimed(self):
+        """
+        Returns whether successors can be generated and timed per group: the
+         library must have a per-group next-state function, and nextStates
+         must not have been replaced (as by `reduction.POR`).
+        """
+        return (self.model._nextStateLong is not None
+                and "nextStates" not in self.__dict__);
+
+    @property
+    def batched(self):
+        return not self._groupTimed;
 
-    def nextStates(self, src):
+    def timedNextStates(self, src, byAction=False, idle=None):
         """
         Returns for each successor state of [src] a tuple consisting of the
+         state object, the action used to get there, and the time taken to
+         generate it. If [byAction] is set and the library can generate the
+         successors of a single group, each group is generated and timed
+         separately, and its time is divided over its successors; the time
+         of a group without successors is reported to [idle] if given.
+        """
+        if(not byAction or not self._groupTimed):
+            yield from super().timedNextStates(src, byAction, idle);
+            return;
+
+        clock = time.perf_counter;
+        acts = self._actions;
+        for g in range(self.model.actionCount):
+            t = clock();
+            succ = list(self.nextStates(src, g));
+            dt = clock() - t;
+            if(not succ):
+                if(idle is not None):
+                    idle(acts[g], dt);
+                continue;
+
+            dt /= len(succ);
+            for s, a in succ:
+                yield (s, a, dt);
+
+    def nextStates(self, src, group=None):
+        """
+        Returns for each successor state of [src], or only for those in
+         transition [group] (an index) if given, a tuple consisting of the
          state object and the action used to get there.
         """
-        mdl = self.model;
-        def call(callback):
-            mdl.nextStates(src.slots, callback);
+        if(self.cache is not None):
+            groups = range(self.model.actionCount) if group is None else [group];
+            yield from self.cache.successors(src, groups);
+            return;
+
+        states, groups = self.model.successors(self._cState(src), group);
+        if(not groups):
+            return;
+
+        # copy the successors out before the buffers are reused
+        arena, acts = self.layout.arena, self._actions;
+        n = len(self.layout);
+        if(arena is not None):
+            succ = [(State(self, arena.copy(states[i * n:(i + 1) * n])),
+                     acts[g]) for i, g in enumerate(groups)];
+        else:
+            stateType = self.model.stateType;
+            size = C.sizeof(stateType);
+            succ = [(State(self, stateType.from_buffer_copy(states, i * size)),
+                     acts[g]) for i, g in enumerate(groups)];
 
-        for dst, act in callback.CallbackGenerator(call):
-            yield (State(self, dst), self._actions[act]);
+        yield from succ;
@@ -1,6 +1,17 @@
 import os;
 import ctypes as C;
 
+try:
+    import numpy;
+except ImportError:
+    numpy = None;
+
+from ..util import bits, cached_property;
+
+# maps each matrix cell to an ASCII binary digit, so that a row can be
+#  converted to a bitset by int()
+_DIGITS = b"0" + b"1" * 255;
+
 # keep references to all types or they might be garbage collected
 ctypes = None;
 
@@ -34,6 +45,9 @@ def init():
                                     t["statePtr"], C.POINTER(C.c_int));
     t["nextStatesFn"] = C.CFUNCTYPE(C.c_int, C.c_void_p, t["statePtr"],
                                     t["nextStatesCb"], C.c_void_p);
+    t["nextStateLongFn"] = C.CFUNCTYPE(C.c_int, C.c_void_p, C.c_int,
+                                       t["statePtr"], t["nextStatesCb"],
+                                       C.c_void_p);
 
     t["stateLabel"] = C.c_int;
     t["stateLabelFn"] = C.CFUNCTYPE(C.c_int, C.c_void_p, C.c_int,
@@ -46,26 +60,113 @@ def init():
                     ("m", C.c_int),
                     ("data", C.POINTER(C.c_char))];
 
+        @cached_property
+        def cells(self):
+            """
+            Returns a copy of the cells of the matrix, row by row, as bytes.
+            """
+            return C.string_at(self.data, self.n * self.m);
+
+        @cached_property
+        def rows(self):
+            """
+            Returns a list of each row of the matrix as an integer bitset, in
+             which bit j is set if column j is nonzero.
+            """
+            cells, m = self.cells.translate(_DIGITS), self.m;
+            return [int(cells[i * m:(i + 1) * m][::-1] or b"0", 2)
+                    for i in range(self.n)];
+
+        @cached_property
+        def cols(self):
+            """
+            Returns a list of each column of the matrix as an integer bitset,
+             in which bit i is set if row i is nonzero.
+            """
+            cells, m = self.cells.translate(_DIGITS), self.m;
+            return [int(cells[j::m][::-1] or b"0", 2) for j in range(m)];
+
+        def row(self, i):
+            """
+            Returns the indices of the nonzero columns of row [i].
+            """
+            return list(bits(self.rows[i]));
+
+        def col(self, j):
+            """
+            Returns the indices of the nonzero rows of column [j].
+            """
+            return list(bits(self.cols[j]));
+
+        def array(self):
+            """
+            Returns the matrix as a NumPy array of booleans.
+            """
+            if(numpy is None):
+                raise ImportError("Matrix.array() requires NumPy");
+            cells = numpy.frombuffer(self.cells, dtype=numpy.uint8);
+            return cells.reshape(self.n, self.m)!=0;
+
         def __iter__(self):
             """
             Returns (row, col) of each nonzero entry in the matrix.
             """
-            for i in range(self.n):
-                for j in range(self.m):
-                    coord = (i, j);
-                    if(coord in self):
-                        yield coord;
+            for i, r in enumerate(self.rows):
+                for j in bits(r):
+                    yield (i, j);
 
         def __contains__(self, coord):
             i, j = coord;
-            return self.data[(self.m * i) + j][0]!=0;
+            return (self.rows[i] >> j) & 1==1;
 
     t["matrix"] = C.POINTER(Matrix);
 
+    class Successors(C.Structure):
+        _fields_ = [("length", C.c_int),
+                    ("count", C.c_int),
+                    ("capacity", C.c_int),
+                    ("states", C.POINTER(C.c_int)),
+                    ("groups", C.POINTER(C.c_int)),
+                    ("filter", C.c_int),
+                    ("failed", C.c_int)];
+
+    t["successors"] = Successors;
+
+    t["exploreCb"] = C.CFUNCTYPE(C.c_int, C.c_int, t["statePtr"], C.c_int,
+                                 C.c_long, C.c_long);
+
+    class Explore(C.Structure):
+        _fields_ = [("length", C.c_int),
+                    ("nextStates", t["nextStatesFn"]),
+                    ("stateLabel", t["stateLabelFn"]),
+                    ("stateLabelAll", t["stateLabelAllFn"]),
+                    ("labelCount", C.c_int),
+                    ("deadlock", C.c_int),
+                    ("checkCount", C.c_int),
+                    ("checks", C.POINTER(C.c_int)),
+                    ("callback", t["exploreCb"]),
+                    ("progress", C.c_long),
+                    ("sample", C.c_long),
+                    ("states", C.c_long),
+                    ("transitions", C.c_long),
+                    ("deadlocks", C.c_long),
+                    ("violations", C.c_long)];
+
+    t["explore"] = Explore;
+
     return t;
 
 ctypes = init();
 
+def _view(ptr, n):
+    """
+    Returns a memoryview of the [n] integers at [ptr], without copying them.
+    """
+    if(n==0):
+        return memoryview(b"").cast("i");
+    data = (C.c_int * n).from_address(C.addressof(ptr.contents));
+    return memoryview(data).cast("B").cast("i");
+
 class CTypes(object):
     """
     Decorator for C wrapper functions.
@@ -142,6 +243,7 @@ class Model(object):
     def __init__(self, lib):
         # callback functions
         self._nextStates = None;
+        self._nextStateLong = None;
         self._stateLabelShort = None;
         self._stateLabelLong = None;
         self._stateLabelAll = None;
@@ -162,6 +264,9 @@ class Model(object):
         self.actionLabel = None;
         self.actionGuards = {};
 
+        # buffers for batched successor generation
+        self._successors = None;
+
         # create wrapper
         self.wrapper = Wrapper(self, lib);
 
@@ -186,6 +291,10 @@ class Model(object):
     def setNextStatesFn(self, fn):
         self._nextStates = fn;
 
+    @CTypes([ctypes["nextStateLongFn"]])
+    def setNextStateLongFn(self, fn):
+        self._nextStateLong = fn;
+
     def nextStates(self, src, callback):
         """
         Calls [callback] for every successor state of [src], with a tuple
@@ -199,6 +308,118 @@ class Model(object):
         cb = ctypes["nextStatesCb"](convert);
         self._nextStates(None, src, cb, None);
 
+    def successors(self, src, group=None):
+        """
+        Returns all successor states of [src], or only those in transition
+         [group] if given, collected in one call, as a tuple (states, groups)
+         of integer buffers: states holds the slots of each successor in turn,
+         and groups the transition group of each. The buffers are views of
+         memory reused by the next call. Successors in a single group are
+         generated by the model's per-group next-state function if it has
+         one, or else by filtering the successors of all groups.
+        """
+        assert(isinstance(src, self.stateType));
+        s = self._successors;
+        if(s is None):
+            lib = self.wrapper.libWrapper;
+            lib._wrapperNextStates.argtypes = [ctypes["nextStatesFn"],
+                                               ctypes["statePtr"],
+                                               C.POINTER(ctypes["successors"])];
+            lib._wrapperNextStatesGroup.argtypes = [
+                    ctypes["nextStatesFn"], ctypes["nextStateLongFn"],
+                    C.c_int, ctypes["statePtr"],
+                    C.POINTER(ctypes["successors"])];
+            lib._wrapperFreeSuccessors.argtypes = [
+                    C.POINTER(ctypes["successors"])];
+
+            s = self._successors = ctypes["successors"]();
+            s.length = len(self.stateSlots);
+
+        lib = self.wrapper.libWrapper;
+        if(group is None):
+            n = lib._wrapperNextStates(self._nextStates, src, C.byref(s));
+        else:
+            n = lib._wrapperNextStatesGroup(
+                    self._nextStates,
+                    self._nextStateLong or ctypes["nextStateLongFn"](),
+                    group, src, C.byref(s));
+        if(n < 0):
+            raise MemoryError("out of memory collecting successors");
+        return (_view(s.states, n * s.length), _view(s.groups, n));
+
+    # kinds of native exploration callbacks
+    EXPLORE_KINDS = ["progress", "deadlock", "label", "sample"];
+
+    def explore(self, callback, deadlock=True, labels=(), progress=0,
+                sample=0):
+        """
+        Explores the reachable states in native code, checking for deadlocks
+         if [deadlock] is set, and that none of the state labels with IDs
+         [labels] hold. Calls [callback] with the kind of event ("progress",
+         "deadlock", "label" or "sample"), the state (or None), the label ID
+         (or -1) and the number of states and transitions so far, for each
+         violation, every [progress] states and every [sample] states; if it
+         returns a true value, the exploration stops; an exception it raises
+         also stops the exploration and is re-raised. Raises ValueError for
+         a label ID that is not in the model.
+        Returns a tuple of the number of states, transitions, deadlocks and
+         violations.
+        """
+        if(labels and self._stateLabelAll is None
+           and self._stateLabelLong is None):
+            raise ValueError("model has no state label function");
+        count = len(self.stateLabels or ());
+        for l in labels:
+            if(not 0 <= l < count):
+                raise ValueError("no state label with ID %r" % (l,));
+
+        n = len(self.stateSlots);
+        error = [];
+        def cb(kind, state, label, states, transitions):
+            # exceptions cannot cross the native code, so stop and re-raise
+            try:
+                if(state):
+                    state = self.stateType(*state[0:n]);
+                else:
+                    state = None;
+                stop = callback(self.EXPLORE_KINDS[kind], state, label,
+                                states, transitions);
+            except BaseException as exc:
+                error.append(exc);
+                return 1;
+            return 1 if stop else 0;
+
+        e = ctypes["explore"]();
+        e.length = n;
+        e.nextStates = self._nextStates;
+        if(self._stateLabelLong is not None):
+            e.stateLabel = self._stateLabelLong;
+        if(self._stateLabelAll is not None):
+            e.stateLabelAll = self._stateLabelAll;
+        e.labelCount = count;
+        e.deadlock = 1 if deadlock else 0;
+        e.checkCount = len(labels);
+        e.checks = (C.c_int * max(len(labels), 1))(*labels);
+        e.callback = ctypes["exploreCb"](cb);
+        e.progress = progress;
+        e.sample = sample;
+
+        lib = self.wrapper.libWrapper;
+        lib._wrapperExplore.argtypes = [C.POINTER(ctypes["explore"]),
+                                        ctypes["statePtr"]];
+        result = lib._wrapperExplore(C.byref(e), self.initialState);
+        if(error):
+            raise error[0];
+        if(result < 0):
+            raise MemoryError("native exploration ran out of memory");
+
+        return (e.states, e.transitions, e.deadlocks, e.violations);
+
+    def __del__(self):
+        if(self._successors is not None):
+            self.wrapper.libWrapper._wrapperFreeSuccessors(
+                    C.byref(self._successors));
+
     # State labels
     @CTypes([C.c_int])
     def setStateLabelCount(self, n):
@@ -1,5 +1,7 @@
 #include <assert.h>
+#include <stdint.h>
 #include <stdlib.h>
+#include <string.h>
 #include "loader.h"
 
 #define _sizeof(a, b) (sizeof(a)/sizeof(b))
@@ -51,6 +53,8 @@ void GBsetNextStateShort(void *model, void (*fn)()){
 }
 
 void GBsetNextStateLong(void *model, void (*fn)()){
+  // Set the next-state function for individual groups to [fn].
+  (*_pyCallback)("setNextStateLongFn", 1, (void *)&fn);
 }
 
 void GBsetNextStateAll(void *model, void (*fn)()){
@@ -58,6 +62,318 @@ void GBsetNextStateAll(void *model, void (*fn)()){
   (*_pyCallback)("setNextStatesFn", 1, (void *)&fn);
 }
 
+// Batched successor generation
+struct TransitionInfo{
+  int *labels;
+  int group;
+  int porProviso;
+};
+
+typedef void (*_nextStatesCb)(void *ctx, struct TransitionInfo *ti, int *dst,
+                              int *cpy);
+typedef int (*_nextStatesFn)(void *model, int *src, _nextStatesCb cb,
+                             void *ctx);
+typedef int (*_nextStateLongFn)(void *model, int group, int *src,
+                                _nextStatesCb cb, void *ctx);
+
+struct Successors{
+  int length;    // slots per state
+  int count;     // number of successors in the buffers
+  int capacity;  // number of successors that fit in the buffers
+  int *states;   // slots of each successor, one after the other
+  int *groups;   // transition group of each successor
+  int filter;    // group to collect successors of, or -1 for all groups
+  int failed;    // whether the buffers could not grow to hold a successor
+};
+
+static void _collect(void *ctx, struct TransitionInfo *ti, int *dst,
+                     int *cpy){
+  // Append successor [dst] of group [ti->group] to the buffers [ctx].
+  struct Successors *s = ctx;
+  if(s->failed || (s->filter >= 0 && ti->group!=s->filter)){
+    return;
+  }
+  if(s->count==s->capacity){
+    int capacity = s->capacity ? 2 * s->capacity : 16;
+    int *states = realloc(s->states,
+                          sizeof(int) * (size_t)capacity * s->length);
+    if(states==NULL){
+      s->failed = 1;
+      return;
+    }
+    s->states = states;
+    int *groups = realloc(s->groups, sizeof(int) * (size_t)capacity);
+    if(groups==NULL){
+      s->failed = 1;
+      return;
+    }
+    s->groups = groups;
+    s->capacity = capacity;
+  }
+
+  memcpy(s->states + (size_t)s->count * s->length, dst,
+         sizeof(int) * s->length);
+  s->groups[s->count++] = ti->group;
+}
+
+int _wrapperNextStates(_nextStatesFn fn, int *src, struct Successors *s){
+  // Collect all successors of [src] under next-state function [fn] into [s].
+  // Returns the number of successors, or -1 if out of memory.
+  s->count = 0;
+  s->filter = -1;
+  s->failed = 0;
+  fn(NULL, src, &_collect, s);
+  return s->failed ? -1 : s->count;
+}
+
+int _wrapperNextStatesGroup(_nextStatesFn all, _nextStateLongFn fn,
+                            int group, int *src, struct Successors *s){
+  // Collect the successors of [src] in transition [group] into [s], using
+  // the per-group next-state function [fn] if given, or else filtering the
+  // successors of all groups under [all].
+  // Returns the number of successors, or -1 if out of memory.
+  s->count = 0;
+  s->failed = 0;
+  if(fn!=NULL){
+    s->filter = -1;
+    fn(NULL, group, src, &_collect, s);
+  }else{
+    s->filter = group;
+    all(NULL, src, &_collect, s);
+    s->filter = -1;
+  }
+  return s->failed ? -1 : s->count;
+}
+
+void _wrapperFreeSuccessors(struct Successors *s){
+  // Free the buffers of [s].
+  free(s->states);
+  free(s->groups);
+  s->states = s->groups = NULL;
+  s->count = s->capacity = 0;
+}
+
+// Native exploration
+typedef int (*_stateLabelFn)(void *model, int label, int *src);
+typedef void (*_stateLabelAllFn)(void *model, int *src, int *labels);
+
+// callback into Python for progress, violations and samples; a nonzero
+// return value stops the exploration
+typedef int (*_exploreCb)(int kind, int *state, int label, long states,
+                          long transitions);
+
+enum{
+  EXPLORE_PROGRESS,
+  EXPLORE_DEADLOCK,
+  EXPLORE_LABEL,
+  EXPLORE_SAMPLE
+};
+
+struct Explore{
+  // model functions
+  int length;
+  _nextStatesFn nextStates;
+  _stateLabelFn stateLabel;
+  _stateLabelAllFn stateLabelAll;
+  int labelCount;
+
+  // checks: deadlocks, and labels that must not hold
+  int deadlock;
+  int checkCount;
+  int *checks;
+
+  // callback, every [progress] and [sample] states if nonzero
+  _exploreCb callback;
+  long progress;
+  long sample;
+
+  // results
+  long states;
+  long transitions;
+  long deadlocks;
+  long violations;
+};
+
+struct Store{
+  int length;
+  size_t count;      // number of states
+  size_t capacity;   // number of states that fit in [data]
+  int *data;         // slots of each state, one after the other
+  size_t size;       // number of slots in [table], a power of two
+  uint32_t *table;   // one plus the index of the state in each used slot
+};
+
+static uint64_t _hash(const int *s, int n){
+  // Returns the hash of state [s] of [n] slots.
+  uint64_t h = 0xcbf29ce484222325ULL;
+  for(int i = 0; i < n; i++){
+    h = (h ^ (uint32_t)s[i]) * 0x100000001b3ULL;
+  }
+  h ^= h >> 33;
+  h *= 0xff51afd7ed558ccdULL;
+  h ^= h >> 33;
+  return h;
+}
+
+static size_t _slot(struct Store *st, const int *s){
+  // Returns the slot of the table holding state [s], or the empty slot where
+  // it would be inserted.
+  size_t mask = st->size - 1;
+  size_t i = _hash(s, st->length) & mask;
+  size_t bytes = sizeof(int) * st->length;
+  while(st->table[i]!=0){
+    int *t = st->data + (size_t)(st->table[i] - 1) * st->length;
+    if(memcmp(t, s, bytes)==0){
+      break;
+    }
+    i = (i + 1) & mask;
+  }
+  return i;
+}
+
+static int _grow(struct Store *st){
+  // Doubles the size of the table. Returns zero if out of memory, leaving
+  // the table unchanged.
+  uint32_t *old = st->table;
+  size_t size = st->size;
+
+  uint32_t *table = calloc(2 * size, sizeof(uint32_t));
+  if(table==NULL){
+    return 0;
+  }
+  st->size = 2 * size;
+  st->table = table;
+  for(size_t i = 0; i < size; i++){
+    if(old[i]!=0){
+      int *t = st->data + (size_t)(old[i] - 1) * st->length;
+      st->table[_slot(st, t)] = old[i];
+    }
+  }
+  free(old);
+  return 1;
+}
+
+static int _add(struct Store *st, const int *s){
+  // Adds state [s] to the store. Returns 1 if it is new, 0 if it was already
+  // stored, and -1 if out of memory.
+  size_t i = _slot(st, s);
+  if(st->table[i]!=0){
+    return 0;
+  }
+
+  if(st->count==st->capacity){
+    int *data = realloc(st->data,
+                        sizeof(int) * 2 * st->capacity * st->length);
+    if(data==NULL){
+      return -1;
+    }
+    st->data = data;
+    st->capacity *= 2;
+  }
+  memcpy(st->data + st->count * st->length, s, sizeof(int) * st->length);
+  st->table[i] = (uint32_t)++st->count;
+
+  if(2 * st->count >= st->size && !_grow(st)){
+    return -1;
+  }
+  return 1;
+}
+
+static int _check(struct Explore *e, int *s, int *labels){
+  // Checks the labels of state [s], reporting violations. Returns nonzero if
+  // the exploration should stop.
+  if(e->checkCount==0){
+    return 0;
+  }
+  if(e->stateLabelAll!=NULL){
+    e->stateLabelAll(NULL, s, labels);
+  }
+
+  for(int j = 0; j < e->checkCount; j++){
+    int l = e->checks[j];
+    int holds = e->stateLabelAll!=NULL ? labels[l]
+                                       : e->stateLabel(NULL, l, s);
+    if(holds){
+      e->violations++;
+      if(e->callback(EXPLORE_LABEL, s, l, e->states, e->transitions)){
+        return 1;
+      }
+    }
+  }
+  return 0;
+}
+
+int _wrapperExplore(struct Explore *e, int *initial){
+  // Explores the states reachable from [initial] breadth-first, with the
+  // checks and callbacks of [e], counting states and transitions in [e].
+  // Returns 0 if all states were explored, 1 if a callback stopped the
+  // exploration, and -1 if out of memory.
+  struct Store st = {e->length, 0, 1024, NULL, 1024, NULL};
+  struct Successors succ = {e->length, 0, 0, NULL, NULL, -1, 0};
+  int *labels = calloc(e->labelCount + 1, sizeof(int));
+  st.data = malloc(sizeof(int) * st.capacity * st.length);
+  st.table = calloc(st.size, sizeof(uint32_t));
+
+  int ret = -1;
+  e->states = e->transitions = e->deadlocks = e->violations = 0;
+  if(labels==NULL || st.data==NULL || st.table==NULL
+     || _add(&st, initial) < 0){
+    goto done;
+  }
+
+  // states are expanded in the order they were found
+  ret = 0;
+  for(size_t i = 0; i < st.count && ret==0; i++){
+    int *s = st.data + i * st.length;
+    e->states++;
+    if(_check(e, s, labels)){
+      ret = 1;
+      break;
+    }
+    if(e->sample > 0 && e->states % e->sample==0
+       && e->callback(EXPLORE_SAMPLE, s, -1, e->states, e->transitions)){
+      ret = 1;
+      break;
+    }
+    if(e->progress > 0 && e->states % e->progress==0
+       && e->callback(EXPLORE_PROGRESS, NULL, -1, e->states,
+                      e->transitions)){
+      ret = 1;
+      break;
+    }
+
+    int n = _wrapperNextStates(e->nextStates, s, &succ);
+    if(n < 0){
+      ret = -1;
+      break;
+    }
+    e->transitions += n;
+    if(n==0){
+      e->deadlocks++;
+      if(e->deadlock
+         && e->callback(EXPLORE_DEADLOCK, s, -1, e->states, e->transitions)){
+        ret = 1;
+        break;
+      }
+    }
+
+    // [s] may move when the store grows
+    for(int j = 0; j < n; j++){
+      if(_add(&st, succ.states + (size_t)j * st.length) < 0){
+        ret = -1;
+        break;
+      }
+    }
+  }
+
+done:
+  _wrapperFreeSuccessors(&succ);
+  free(labels);
+  free(st.data);
+  free(st.table);
+  return ret;
+}
+
 // State label functions
 void lts_type_set_state_label_count(void *type, int n){
   // Set the amount of state labels to [n].
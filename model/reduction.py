@@ -25,3 +25,27 @@ def POR(mdl):
     # XXX: new function bound to original object!
     m.nextStates = types.MethodType(nextStates, mdl);
     return m;
+
+def Symmetry(mdl):
+    """
+    Returns a symmetry-reduced version of the model [mdl], which explores
+     only the representatives given by the model's canonical function. The
+     reduction is exact if the transitions of [mdl] are invariant under the
+     symmetries that canonical identifies.
+    """
+    def nextStates(self, src):
+        """
+        Returns for each successor state of [src] in a [model] a tuple
+         consisting of the representative of the state and the action used to
+         get there.
+        """
+        for s, t in self.nextStates(src):
+            yield (self.canonical(s), t);
+
+    # create shallow copy and replace nextStates
+    m = copy.copy(mdl);
+    # XXX: new function bound to original object!
+    m.nextStates = types.MethodType(nextStates, mdl);
+    if(mdl.initialState is not None):
+        m.initialState = mdl.canonical(mdl.initialState);
+    return m;
@@ -0,0 +1,189 @@
+import array;
+import time;
+
+class BFS(object):
+    """
+    Breadth-first search object.
+
+    Iterating through this object yields each reachable state of [model] in
+     breadth-first order, adding deadlock states to [dead] and livelock
+     states to [live], and reporting to an [observer] (see
+     `metrics.Observer`) if given. Each state is given an integer ID, and the
+     ID of its parent state and the action leading to it are kept, so that a
+     shortest trace to any visited state can be reconstructed.
+    """
+    def __init__(self, model, dead=None, live=None, observer=None):
+        self.model = model;
+        self.dead = dead;
+        self.live = live;
+        self.observer = observer;
+
+        # state IDs, and parent ID and action ID by state ID
+        self.ids = {};
+        self.parent = array.array("q");
+        self.action = array.array("q");
+
+        # interned actions
+        self.actions = [];
+        self.actionIds = {};
+
+        # size of the frontier at each depth
+        self.levels = [];
+
+    def __len__(self):
+        return len(self.ids);
+
+    def _add(self, state, parent, action):
+        """
+        Record [state], reached from the state with ID [parent] by [action].
+        Returns whether the state is new.
+        """
+        ids = self.ids;
+        if(state in ids):
+            return False;
+
+        a = -1;
+        if(action is not None):
+            a = self.actionIds.get(action, None);
+            if(a is None):
+                a = self.actionIds[action] = len(self.actions);
+                self.actions.append(action);
+
+        ids[state] = len(self.parent);
+        self.parent.append(parent);
+        self.action.append(a);
+        return True;
+
+    def __iter__(self):
+        if(self.observer is not None):
+            return self._observed();
+
+        return self._search();
+
+    def _search(self):
+        mdl = self.model;
+        dead, live = self.dead, self.live;
+        ids = self.ids;
+
+        frontier = [mdl.initialState];
+        self._add(mdl.initialState, -1, None);
+        while frontier:
+            self.levels.append(len(frontier));
+
+            nextFrontier = [];
+            for cur in frontier:
+                n = ids[cur];
+
+                # visit all successor states
+                succ = 0;
+                for s, a in mdl.nextStates(cur):
+                    succ += 1;
+                    last = s;
+                    if(self._add(s, n, a)):
+                        nextFrontier.append(s);
+
+                # record dead- and livelocks
+                if(dead is not None and succ==0):
+                    dead.add(cur);
+                if(live is not None and succ==1 and last==cur):
+                    live.add(cur);
+
+                if(cur is not None):
+                    yield cur;
+
+            frontier = nextFrontier;
+
+    def _observed(self):
+        """
+        Version of the search that reports to the observer. Each successor
+         is added to [ids] before the transition to it is reported, and the
+         observer's end function is called even if the search is not run to
+         completion.
+        """
+        mdl = self.model;
+        dead, live = self.dead, self.live;
+        ids = self.ids;
+        observer = self.observer;
+        clock = time.perf_counter;
+
+        observer.begin(mdl, ids);
+        byAction = getattr(observer, "byAction", False);
+        idle = getattr(observer, "idle", None);
+        try:
+            frontier = [mdl.initialState];
+            self._add(mdl.initialState, -1, None);
+            observer.visit(mdl.initialState, None, True, 0.0);
+            while frontier:
+                self.levels.append(len(frontier));
+
+                nextFrontier = [];
+                for cur in frontier:
+                    n = ids[cur];
+
+                    # visit all successor states, timing each
+                    succ = 0;
+                    for s, a, dt in mdl.timedNextStates(cur, byAction, idle):
+                        succ += 1;
+                        last = s;
+
+                        t = clock();
+                        new = self._add(s, n, a);
+                        lookup = clock() - t;
+
+                        observer.transition(cur, s, a, dt);
+                        observer.visit(s, a, new, lookup);
+                        if(new):
+                            nextFrontier.append(s);
+                    observer.expand(cur, succ,
+                                    len(frontier) + len(nextFrontier));
+
+                    # record dead- and livelocks
+                    if(dead is not None and succ==0):
+                        dead.add(cur);
+                    if(live is not None and succ==1 and last==cur):
+                        live.add(cur);
+
+                    if(cur is not None):
+                        yield cur;
+
+                frontier = nextFrontier;
+        finally:
+            observer.end();
+
+    def path(self, state):
+        """
+        Returns the list of state IDs on the shortest path from the initial
+         state to a visited [state].
+        """
+        ids = [];
+        n = self.ids[state];
+        while n >= 0:
+            ids.append(n);
+            n = self.parent[n];
+
+        ids.reverse();
+        return ids;
+
+    def trace(self, state):
+        """
+        Returns a shortest trace from the initial state to a visited [state],
+         as a list of tuples consisting of the action taken and the state it
+         leads to. Raises a RuntimeError if a step of the trace cannot be
+         regenerated, as when nextStates is not deterministic.
+        """
+        trace = [];
+        cur = self.model.initialState;
+        for n in self.path(state)[1:]:
+            # regenerate the successor with the recorded ID
+            act = self.actions[self.action[n]];
+            for s, a in self.model.nextStates(cur):
+                if(a is act and self.ids.get(s, None)==n):
+                    break;
+            else:
+                raise RuntimeError("cannot regenerate the transition by %r to "
+                                   "state %d of the trace" % (act.id, n));
+
+            trace.append((a, s));
+            cur = s;
+
+        return trace;
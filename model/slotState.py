@@ -1,22 +1,133 @@
+import array;
 import copy;
 
 from . import model;
 
+class Arena(object):
+    """
+    Slot arena object.
+
+    Allocates records of [width] integers of a given [typecode] from
+     contiguous chunks of [chunk] records. Each record is a memoryview of
+     its part of a chunk, so a record can be copied in one operation, and
+     passed wherever a buffer is accepted without copying. A chunk is freed
+     once none of its records are in use.
+    """
+    def __init__(self, width, typecode="i", chunk=4096):
+        self.width = width;
+        self.typecode = typecode;
+        self.itemsize = array.array(typecode).itemsize;
+        self.chunk = chunk;
+
+        self.view = None;
+        self.next = self.end = 0;
+
+    def _alloc(self):
+        """
+        Returns a new, zeroed record.
+        """
+        if(self.next==self.end):
+            # start a new chunk; the old one is kept alive by its records
+            size = self.chunk * max(self.width, 1);
+            data = array.array(self.typecode, bytes(size * self.itemsize));
+            self.view = memoryview(data);
+            self.next, self.end = 0, size;
+
+        n = self.next;
+        self.next += max(self.width, 1);
+        return self.view[n:n + self.width];
+
+    def new(self, data=None):
+        """
+        Returns a new record, holding the values in [data] if given, or else
+         zeros.
+        """
+        r = self._alloc();
+        if(data is not None):
+            r[:] = array.array(self.typecode, data);
+        return r;
+
+    def copy(self, record):
+        """
+        Returns a new record holding a copy of [record].
+        """
+        r = self._alloc();
+        r[:] = record;
+        return r;
+
+class Layout(object):
+    """
+    Slot layout object.
+
+    Describes the slots of the states of a model: their [names], in order,
+     and the offset of each name in [offsets]. A layout is created once per
+     model and shared by all of its states. If [arena] is set, the slots of
+     states are records in an [arena] (see `Arena`) rather than lists.
+    """
+    def __init__(self, names, arena=False):
+        self.names = names;
+        self.offsets = {n: i for i, n in enumerate(names)};
+        self.arena = Arena(len(names)) if arena else None;
+
+    def __repr__(self):
+        return "Layout(%r)" % (self.names,);
+
+    def __len__(self):
+        return len(self.names);
+
+    def bind(self, cls):
+        """
+        Returns a subclass of the state class [cls] with an attribute for
+         each slot whose name is an identifier that [cls] does not use, so
+         that the slot can be accessed as, for example, state.pcA.
+        """
+        attrs = {};
+        for i, n in enumerate(self.names):
+            if(isinstance(n, bytes)):
+                n = n.decode(errors="replace");
+            if(not n.isidentifier() or hasattr(cls, n) or n in attrs):
+                continue;
+            attrs[n] = _slot(i);
+
+        return type(cls.__name__, (cls,), attrs);
+
+def _slot(i):
+    """
+    Returns the attribute descriptor for the slot at offset [i].
+    """
+    def get(self):
+        return self.slots[i];
+
+    def set(self, v):
+        self.slots[i] = v;
+
+    return property(get, set);
+
 class SlotState(model.State):
     """
     Slot-based state object.
     """
-    def __init__(self, model, names, data=None):
+    def __init__(self, model, layout, data=None):
         """
-        Create a new state for a [model] with slots with given [names]. Slots
-         can optionally be initialized with [data].
+        Create a new state for a [model] with slots with a given [layout] (or
+         list of names, for which a new layout is created). Slots can
+         optionally be initialized with [data].
         """
         super().__init__(model);
-        self.names = names;
+        if(not isinstance(layout, Layout)):
+            layout = Layout(layout);
+        self.layout = layout;
         if(data is None):
-            data = [0] * len(names);
+            if(layout.arena is not None):
+                data = layout.arena.new();
+            else:
+                data = [0] * len(layout);
         self.slots = data;
 
+    @property
+    def names(self):
+        return self.layout.names;
+
     def __repr__(self):
         l = [];
         for i, v in enumerate(self.slots):
@@ -27,10 +138,10 @@ class SlotState(model.State):
         return len(self.slots);
 
     def __getitem__(self, n):
-        return self.slots[self.names.index(n)];
+        return self.slots[self.layout.offsets[n]];
 
     def __setitem__(self, n, v):
-        self.slots[self.names.index(n)] = v;
+        self.slots[self.layout.offsets[n]] = v;
 
     def __iter__(self):
         return iter(self.slots);
@@ -41,11 +152,15 @@ class SlotState(model.State):
     def __eq__(self, other):
         same = (self.slots==other.slots);
         same = same or super().__eq__(other);
-        return (self.names is other.names) and same;
+        return (self.layout is other.layout) and same;
 
     def clone(self):
         """
         Returns a copy of this state that may be modified.
         """
-        slots = copy.copy(self.slots);
-        return type(self)(self.model, self.names, slots);
+        arena = self.layout.arena;
+        if(arena is not None):
+            slots = arena.copy(self.slots);
+        else:
+            slots = copy.copy(self.slots);
+        return type(self)(self.model, self.layout, slots);
@@ -1,4 +1,15 @@
+import array;
 import collections.abc;
+import mmap;
+import os;
+import shutil;
+import struct;
+import tempfile;
+
+try:
+    import numpy;
+except ImportError:
+    numpy = None;
 
 # Blom, S.; Lisser, B.; Van de Pol, J. et al. "A Database Approach to
 # Distributed State Space Generation". Electronic Notes in Theoretical Computer
@@ -7,35 +18,130 @@ import collections.abc;
 class TreeSet(collections.abc.MutableSet):
     """
     Tree-based state set object.
+
+    Each node stores the pairs of indices into its two children (or the
+     values themselves, at the leaves) in a flat array of integers, so that
+     each pair takes two machine words. Pairs are found through an
+     open-addressing table of [size] slots that grows as needed, holding
+     one plus the index of the pair in each used slot.
     """
-    def __init__(self):
-        self.data = [];
+    def __init__(self, size=16):
+        size = 1 << max(size - 1, 1).bit_length();
+        self.data = array.array("q");
+        self.index = self._table(size);
+        self.count = 0;
         self.out = [None, None];
 
     def __len__(self):
-        return sum(1 for _ in iter(self));
+        # every stored pair is a distinct tuple
+        return self.count;
+
+    @property
+    def memory(self):
+        """
+        Returns the size of the pair arrays and tables of this tree in bytes.
+        """
+        size = len(self.data) * self.data.itemsize \
+             + len(self.index) * self.index.itemsize;
+        return size + sum(out.memory for out in self.out if out is not None);
+
+    def bytesPerState(self):
+        """
+        Returns the memory used per stored state in bytes.
+        """
+        return self.memory / max(self.count, 1);
+
+    def _table(self, size):
+        """
+        Returns a new, empty table of [size] slots.
+        """
+        return array.array("I", bytes(4 * size));
+
+    def _child(self, side):
+        """
+        Returns the child tree on a given [side] (0 or 1), creating it if
+         needed.
+        """
+        if(self.out[side] is None):
+            self.out[side] = TreeSet();
+        return self.out[side];
+
+    def _find(self, lo, hi):
+        """
+        Returns the slot for the pair ([lo], [hi]): either the slot holding
+         it or the empty slot where it would be inserted.
+        """
+        index, data = self.index, self.data;
+        mask = len(index) - 1;
+        i = hash((lo, hi)) & mask;
+        while True:
+            n = index[i];
+            if(n==0):
+                return i;
+            n = 2 * n;
+            if(data[n - 2]==lo and data[n - 1]==hi):
+                return i;
+            i = (i + 1) & mask;
+
+    def _lookup(self, lo, hi):
+        """
+        Returns the index of the pair ([lo], [hi]), or -1 if not present.
+        """
+        return self.index[self._find(lo, hi)] - 1;
+
+    def _put(self, lo, hi):
+        """
+        Returns the index of the pair ([lo], [hi]), adding it if needed.
+        """
+        i = self._find(lo, hi);
+        n = self.index[i];
+        if(n!=0):
+            return n - 1;
+
+        n = self.count;
+        self.data.append(lo);
+        self.data.append(hi);
+        self.count += 1;
+        self.index[i] = self.count;
+        if(4 * self.count >= 3 * len(self.index)):
+            self._grow();
+
+        return n;
+
+    def _grow(self):
+        """
+        Doubles the size of the table.
+        """
+        self.index = self._table(2 * len(self.index));
+        data, index = self.data, self.index;
+        mask = len(index) - 1;
+        for n in range(self.count):
+            i = hash((data[2 * n], data[2 * n + 1])) & mask;
+            while index[i]!=0:
+                i = (i + 1) & mask;
+            index[i] = n + 1;
 
-    def _get(self, pair):
+    def _get(self, n):
         """
-        Returns the full tuple for a given [pair].
+        Returns the full tuple for the pair with index [n].
         """
-        out, lo = self.out[0], pair[0];
+        out, lo = self.out[0], self.data[2 * n];
         if(out is not None):
-            lo = out._get(out.data[lo]);
+            lo = out._get(lo);
         else:
             lo = (lo,);
 
-        out, hi = self.out[1], pair[1];
+        out, hi = self.out[1], self.data[2 * n + 1];
         if(out is not None):
-            hi = out._get(out.data[hi]);
+            hi = out._get(hi);
         else:
             hi = (hi,);
 
         return lo + hi;
 
     def __iter__(self):
-        for pair in self.data:
-            yield self._get(pair);
+        for n in range(self.count):
+            yield self._get(n);
 
     def _split(self, item):
         """
@@ -51,26 +157,26 @@ class TreeSet(collections.abc.MutableSet):
 
     def _index(self, item):
         """
-        Returns the index a given tuple [item] can be found at.
+        Returns the index a given tuple [item] can be found at,
+         or -1 if it is not in this set.
         """
         if(self.out[0] is None and self.out[1] is None):
-            return self.data.index(item);
+            return self._lookup(item[0], item[1]);
 
         lo, hi = self._split(item);
         if(self.out[0] is not None):
             lo = self.out[0]._index(lo);
+            if(lo < 0):
+                return -1;
         if(self.out[1] is not None):
             hi = self.out[1]._index(hi);
+            if(hi < 0):
+                return -1;
 
-        return self.data.index((lo, hi));
+        return self._lookup(lo, hi);
 
     def __contains__(self, item):
-        item = tuple(item);
-        try:
-            i = self._index(item);
-            return True;
-        except ValueError as e:
-            return False;
+        return self._index(tuple(item)) >= 0;
 
     def _add(self, item):
         """
@@ -80,27 +186,16 @@ class TreeSet(collections.abc.MutableSet):
         lo, hi = item[:l], item[l:];
 
         if(len(lo) > 1):
-            if(self.out[0] is None):
-                self.out[0] = TreeSet();
-            lo = self.out[0]._add(lo);
+            lo = self._child(0)._add(lo);
         else:
             lo = lo[0];
 
         if(len(hi) > 1):
-            if(self.out[1] is None):
-                self.out[1] = TreeSet();
-            hi = self.out[1]._add(hi);
+            hi = self._child(1)._add(hi);
         else:
             hi = hi[0];
 
-        pair = (lo, hi);
-        try:
-            n = self.data.index(pair);
-        except ValueError:
-            n = len(self.data);
-            self.data.append(pair);
-
-        return n;
+        return self._put(lo, hi);
 
     def add(self, item):
         """
@@ -108,8 +203,276 @@ class TreeSet(collections.abc.MutableSet):
         """
         self._add(tuple(item));
 
+    def findOrAdd(self, item):
+        """
+        Add a given state [item] to this set if it is not yet in it.
+        Returns a tuple (id, new), where id is the ID of the state and new
+         tells whether it was added. States are numbered from 0 in the order
+         they are added, and keep their ID.
+        """
+        count = self.count;
+        n = self._add(tuple(item));
+        return (n, self.count!=count);
+
+    def find(self, item):
+        """
+        Returns the ID of a given state [item], or -1 if it is not in this
+         set.
+        """
+        return self._index(tuple(item));
+
+    def get(self, n):
+        """
+        Returns the state with ID [n] as a tuple.
+        """
+        if(not 0 <= n < self.count):
+            raise IndexError(n);
+        return self._get(n);
+
+    def _rows(self, items):
+        """
+        Returns the states in [items], an iterable of states or a 2-D NumPy
+         array with a state in each row, as tuples.
+        """
+        if(numpy is not None and isinstance(items, numpy.ndarray)):
+            return map(tuple, items.tolist());
+        return map(tuple, items);
+
+    def _result(self, items, values, dtype):
+        """
+        Returns [values] computed for [items] as a NumPy array of [dtype] if
+         [items] is one, or else as is.
+        """
+        if(numpy is not None and isinstance(items, numpy.ndarray)):
+            return numpy.asarray(values, dtype=dtype);
+        return values;
+
+    def addMany(self, items):
+        """
+        Add the states in [items], an iterable of states or a 2-D NumPy array
+         with a state in each row, to this set.
+        Returns a tuple (ids, new) of the ID of each state and whether it was
+         added, as NumPy arrays if [items] is one, or else as an array and a
+         list.
+        """
+        ids, new = array.array("q"), [];
+        add = self._add;
+        for item in self._rows(items):
+            count = self.count;
+            ids.append(add(item));
+            new.append(self.count!=count);
+
+        return (self._result(items, ids, "int64"),
+                self._result(items, new, "bool"));
+
+    def containsMany(self, items):
+        """
+        Returns for each state in [items], an iterable of states or a 2-D
+         NumPy array with a state in each row, whether it is in this set, as
+         a NumPy array if [items] is one, or else as a list.
+        """
+        index = self._index;
+        found = [index(item) >= 0 for item in self._rows(items)];
+        return self._result(items, found, "bool");
+
     def discard(self, item):
         """
         Remove a given state [item] from this set.
         """
         raise NotImplementedError;
+
+class MappedArray(object):
+    """
+    Memory-mapped array object.
+
+    Array of integers of a given [typecode] kept in the file [path], after a
+     header holding its length. If the file does not exist, it is created
+     holding [size] zeros. The file grows as items are appended, and is
+     remapped when it does.
+    """
+    header = struct.Struct("<Q");
+
+    def __init__(self, path, typecode, size=0):
+        self.path = path;
+        self.typecode = typecode;
+        self.itemsize = array.array(typecode).itemsize;
+
+        if(os.path.exists(path)):
+            self.file = open(path, "r+b");
+            self.length, = self.header.unpack(
+                    self.file.read(self.header.size));
+        else:
+            self.file = open(path, "w+b");
+            self.length = size;
+            self.file.truncate(self.header.size
+                               + max(size, 1024) * self.itemsize);
+
+        self._map();
+
+    def _map(self):
+        """
+        Maps the file into memory.
+        """
+        self.map = mmap.mmap(self.file.fileno(), 0);
+        self.header.pack_into(self.map, 0, self.length);
+        raw = memoryview(self.map);
+        self.view = raw[self.header.size:].cast(self.typecode);
+        raw.release();
+
+    def _unmap(self):
+        """
+        Unmaps the file.
+        """
+        self.view.release();
+        self.map.close();
+
+    def __len__(self):
+        return self.length;
+
+    def __getitem__(self, i):
+        return self.view[i];
+
+    def __setitem__(self, i, v):
+        self.view[i] = v;
+
+    def append(self, v):
+        """
+        Appends [v] to this array.
+        """
+        if(self.length==len(self.view)):
+            self._unmap();
+            self.file.truncate(self.header.size
+                               + 2 * self.length * self.itemsize);
+            self._map();
+
+        self.view[self.length] = v;
+        self.length += 1;
+        self.header.pack_into(self.map, 0, self.length);
+
+    def truncate(self, length):
+        """
+        Drops the items of this array after the first [length].
+        """
+        self.length = min(length, self.length);
+        self.header.pack_into(self.map, 0, self.length);
+
+    def rename(self, path):
+        """
+        Moves the file of this array to [path].
+        """
+        os.replace(self.path, path);
+        self.path = path;
+
+    def flush(self):
+        """
+        Writes changes to the file.
+        """
+        self.map.flush();
+
+    def close(self):
+        """
+        Writes changes to the file, and closes it.
+        """
+        if(self.file.closed):
+            return;
+        self.flush();
+        self._unmap();
+        self.file.close();
+
+class MappedTreeSet(TreeSet):
+    """
+    Memory-mapped tree-based state set object.
+
+    Like `TreeSet`, but the pairs and table of each node are kept in
+     memory-mapped files named [name] in the directory [path] (a new
+     temporary directory if not given), so that the set can grow past the
+     available memory and persists after exploration. Creating a set on an
+     existing directory opens the set stored in it, repairing it if it was
+     left inconsistent by a crash. A temporary directory is removed when the
+     set is closed or garbage collected.
+    """
+    def __init__(self, path=None, size=16, name="t"):
+        self.temporary = (path is None);
+        if(self.temporary):
+            path = tempfile.mkdtemp(prefix="treeset-");
+        os.makedirs(path, exist_ok=True);
+        self.path = path;
+        self.name = name;
+
+        base = os.path.join(path, name);
+        size = 1 << max(size - 1, 1).bit_length();
+        self.data = MappedArray(base + ".pairs", "q");
+        self.index = MappedArray(base + ".index", "I", size);
+        self.count = len(self.data) // 2;
+        self.out = [None, None];
+
+        # a crash while adding a pair can leave half of it stored, or all of
+        #  it stored but not in the table; rebuild the table if it does not
+        #  hold exactly the stored pairs
+        self.data.truncate(2 * self.count);
+        if(self._used()!=self.count):
+            self._grow();
+
+        # open the children stored before
+        for side in range(2):
+            if(os.path.exists(os.path.join(path, name + "%d.pairs" % side))):
+                self._child(side);
+
+    def _used(self, chunk=1 << 20):
+        """
+        Returns the number of used slots in the table, counting [chunk]
+         slots at a time.
+        """
+        index = self.index;
+        size, free = len(index), 0;
+        for i in range(0, size, chunk):
+            a = array.array("I");
+            a.frombytes(index.view[i:min(i + chunk, size)].cast("B"));
+            free += a.count(0);
+        return size - free;
+
+    def _child(self, side):
+        if(self.out[side] is None):
+            self.out[side] = MappedTreeSet(self.path,
+                                           name=self.name + str(side));
+        return self.out[side];
+
+    def _table(self, size):
+        # build the new table next to the current one, see _grow
+        path = os.path.join(self.path, self.name + ".index.new");
+        if(os.path.exists(path)):
+            os.remove(path);
+        return MappedArray(path, "I", size);
+
+    def _grow(self):
+        old = self.index;
+        super()._grow();
+        old.close();
+        self.index.rename(old.path);
+
+    def flush(self):
+        """
+        Writes changes to the files of this set.
+        """
+        self.data.flush();
+        self.index.flush();
+        for out in self.out:
+            if(out is not None):
+                out.flush();
+
+    def close(self):
+        """
+        Writes changes to the files of this set, and closes them. If the set
+         is in a temporary directory, the directory is removed.
+        """
+        self.data.close();
+        self.index.close();
+        for out in self.out:
+            if(out is not None):
+                out.close();
+        if(self.temporary):
+            shutil.rmtree(self.path, ignore_errors=True);
+
+    def __del__(self):
+        if(getattr(self, "temporary", False)):
+            self.close();
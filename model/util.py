@@ -15,6 +15,16 @@ class cached_property(object):
         obj.__dict__[self.__name__] = v;
         return v;
 
+def bits(n):
+    """
+    Returns the index of each set bit of the integer bitset [n], in
+     increasing order.
+    """
+    while n:
+        low = n & -n;
+        yield low.bit_length() - 1;
+        n ^= low;
+
 class _Tokenizer(type):
     def __init__(cls, name, bases, namespace, **kwds):
         if("_tokens" not in namespace):
@@ -1,56 +1,81 @@
 from argparse import Action
+import functools
+
 import model
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 class State(model.State):
     """
-    State for a Peterson model [model].
+    Packed state for a Peterson model [model].
+
+    All pc, k, level and last fields are packed into one integer [value];
+     field j occupies [model.width] bits at offset j * model.width, in the
+     order pc(0), k(0), ..., pc(N-1), k(N-1), level[0..N-1], last[0..N-2].
+     Symmetric models append the set of processes checked by each process,
+     done(0), ..., done(N-1), as bit masks.
     """
-    __slots__ = ["process", "level", "last"]
+    __slots__ = ["value", "hash"]
 
-    class Process(object):
-        __slots__ = ["pc", "k"]
+    def __init__(self, model, value=0):
+        super().__init__(model)
+        self.value = value
+        self.hash = hash(value)
 
-        def __init__(self, pc=0, k=0):
-            self.pc = pc
-            self.k = k
+    def __repr__(self):
+        n = self.model.processes
+        procs = tuple("Process(pc = %d, k = %d)" % (self.pc(i), self.k(i))
+                      for i in range(n))
+        level = [self.level(i) for i in range(n)]
+        last = [self.last(i) for i in range(n - 1)]
+        return "State((%s),\n level = %s, last = %s)" \
+            % (", ".join(procs), level, last)
 
-        def __repr__(self):
-            return "Process(pc = %d, k = %d)" % (self.pc, self.k)
+    def __hash__(self):
+        return self.hash
 
-        def clone(self):
-            return State.Process(self.pc, self.k)
+    def __eq__(self, other):
+        return self.value == other.value
 
-    def __init__(self, model):
-        super().__init__(model)
-        self.process = tuple(State.Process() for _ in range(model.processes))
-        self.level = [0] * model.processes
-        self.last = [0] * (model.processes - 1)
+    def __iter__(self):
+        mdl = self.model
+        v, w, mask = self.value, mdl.width, mdl.mask
+        for _ in range(mdl.fields):
+            yield v & mask
+            v >>= w
 
-    def __repr__(self):
-        tmp = (self.process, self.level, self.last)
-        return "State(%s,\n level = %s, last = %s)" % tmp
+    def field(self, j):
+        """
+        Returns the value of field [j].
+        """
+        mdl = self.model
+        return (self.value >> (j * mdl.width)) & mdl.mask
 
-    def __iter__(self):
-        for proc in self.process:
-            yield proc.pc
-            yield proc.k
-        for i in self.level:
-            yield i
-        for i in self.last:
-            yield i
+    def pc(self, i):
+        return self.field(2 * i)
+
+    def k(self, i):
+        return self.field(2 * i + 1)
+
+    def level(self, i):
+        return self.field(2 * self.model.processes + i)
+
+    def last(self, i):
+        return self.field(3 * self.model.processes + i)
+
+    def done(self, i):
+        return self.field(4 * self.model.processes - 1 + i)
 
     def clone(self):
         """
-        Returns a copy of this state that may be modified.
+        Returns a copy of this state. Packed states are immutable, so the
+         state itself is returned.
         """
-        s = State.__new__(State)
-        super(State, s).__init__(self.model)
-
-        s.process = tuple(proc.clone() for proc in self.process)
-        s.level = self.level[:]
-        s.last = self.last[:]
-        return s
+        return self
 
     @property
     def labels(self):
@@ -58,8 +83,8 @@ class State(model.State):
         Returns a set of all state labels applicable in this state.
         """
         labels = set()
-        for i, proc in enumerate(self.process):
-            if(proc.pc == 5):
+        for i in range(self.model.processes):
+            if(self.pc(i) == 5):
                 labels.add("proc %d in CS" % i)
 
         mdl = self.model
@@ -69,13 +94,32 @@ class State(model.State):
 class Model(model.Model):
     """
     Peterson model with [n] processes.
+
+    Each process checks the other processes in index order. If [symmetric]
+     is set, it instead checks them in any order, keeping the set of checked
+     processes; the processes are then interchangeable, which `canonical`
+     exploits for symmetry reduction.
     """
     name = "Peterson"
 
-    def __init__(self, n=3):
+    def __init__(self, n=3, symmetric=False):
         super().__init__()
 
         self.processes = n
+        self.symmetric = symmetric
+
+        # packed layout: every field is wide enough for pc (< 16), k (<= n)
+        #  and, for symmetric models, a mask of n processes
+        self.fields = 4 * n - 1
+        self.width = max(4, n.bit_length())
+        if symmetric:
+            self.fields += n
+            self.width = max(self.width, n)
+        self.mask = (1 << self.width) - 1
+
+        self._canonical = functools.lru_cache(maxsize=1 << 16)(
+            self._canonicalValue)
+
         self.initialState = State(self)
 
         for i in range(self.processes):
@@ -91,71 +135,370 @@ class Model(model.Model):
             # create labels
             self.labels.add("proc %d in CS" % i)
 
+        # per-process transition tables, indexed by pc
+        self.table = [self._compile(i) for i in range(self.processes)]
+
+    def _compile(self, i):
+        """
+        Returns a tuple (pc offset, row) for process [i], where row[pc] lists
+         the transitions at that pc as (guard, update, action) tuples. Each
+         entry whose guard holds for the packed value fires; an entry without
+         a guard fires only if no entry before it did, and ends the row.
+        """
+        N = self.processes
+        W, M = self.width, self.mask
+
+        pcOff = 2 * i * W
+        kOff = pcOff + W
+        levelOff = (2 * N + i) * W
+        lastOff = 3 * N * W
+        levels = 2 * N * W
+        doneOff = (4 * N - 1 + i) * W
+
+        act = {a: self.actions["%s(%d)" % (a, i)]
+               for a in ["for-level", "set-last", "for-k", "if-ki", "await",
+                         "enter-cs", "exit-cs"]}
+
+        def setLast(v):
+            off = lastOff + ((v >> levelOff) & M) * W
+            return v + ((i - ((v >> off) & M)) << off) + (1 << pcOff)
+
+        def canEnter(v):
+            level = (v >> levelOff) & M
+            last = (v >> (lastOff + level * W)) & M
+            k = (v >> kOff) & M
+            return last != i or (v >> (levels + k * W)) & M < level
+
+        row = [()] * (M + 1)
+        row[0] = (
+            (lambda v: (v >> levelOff) & M < N - 1,
+             lambda v: v + (1 << pcOff), act["for-level"]),
+            (None, lambda v: v + (10 << pcOff), act["for-level"]),
+        )
+        row[1] = ((None, setLast, act["set-last"]),)
+        row[2] = (
+            (lambda v: (v >> kOff) & M < N,
+             lambda v: v + (1 << pcOff), act["for-k"]),
+            (None, lambda v: v - (((v >> kOff) & M) << kOff) + (6 << pcOff),
+             act["for-k"]),
+        )
+        row[3] = (
+            (lambda v: (v >> kOff) & M == i,
+             lambda v: v + (1 << kOff) - (1 << pcOff), act["if-ki"]),
+            (None, lambda v: v + (2 << pcOff), act["if-ki"]),
+        )
+        row[5] = (
+            (canEnter, lambda v: v + (1 << pcOff), act["await"]),
+            (None, lambda v: v, act["await"]),
+        )
+        row[6] = ((None, lambda v: v + (1 << kOff) - (4 << pcOff),
+                   act["for-k"]),)
+
+        if self.symmetric:
+            # check any unchecked process k, then forget the checked set
+            def check(k):
+                bit = 1 << (doneOff + k)
+                return (lambda v: not v & bit,
+                        lambda v: v + (k << kOff) + (3 << pcOff),
+                        act["for-k"])
+
+            row[2] = tuple(check(k) for k in range(N) if k != i) + (
+                (None, lambda v: v - (((v >> doneOff) & M) << doneOff)
+                 + (6 << pcOff), act["for-k"]),)
+            row[6] = ((None, lambda v: v + (1 << (doneOff + ((v >> kOff) & M)))
+                       - (((v >> kOff) & M) << kOff) - (4 << pcOff),
+                       act["for-k"]),)
+        row[8] = ((None, lambda v: v + (1 << levelOff) - (8 << pcOff),
+                   act["for-level"]),)
+        row[10] = ((None, lambda v: v + (1 << pcOff), act["enter-cs"]),)
+        row[11] = ((None,
+                    lambda v: v - (((v >> levelOff) & M) << levelOff)
+                    - (11 << pcOff), act["exit-cs"]),)
+
+        return (pcOff, tuple(row))
+
     def nextStates(self, src: State):
         """
         Returns for each successor state of [src] a tuple consisting of the
          state object and the action used to get there.
         """
-        N = self.processes
-        for i in range(self.processes):
-            dst = src.clone()
-            proc = dst.process[i]
+        v, M = src.value, self.mask
+        for pcOff, row in self.table:
+            fired = False
+            for guard, update, act in row[(v >> pcOff) & M]:
+                if guard is None:
+                    if not fired:
+                        yield (State(self, update(v)), act)
+                    break
+                if guard(v):
+                    fired = True
+                    yield (State(self, update(v)), act)
+
+    def canonical(self, state):
+        """
+        Returns the representative of the symmetry class of [state]. Only
+         symmetric models have symmetries; see [symmetric].
+        """
+        if not self.symmetric:
+            return state
+        v = self._canonical(state.value)
+        return state if v == state.value else State(self, v)
 
-            if proc.pc == 0:
-                if dst.level[i] < N - 1:
-                    proc.pc = 1
-                    yield (dst, self.actions["for-level(%d)" % i])
-                else:  # exit loop
-                    proc.pc = 10
-                    yield (dst, self.actions["for-level(%d)" % i])
-
-            elif proc.pc == 1:
-                dst.last[dst.level[i]] = i
-                proc.pc = 2
-                yield (dst, self.actions["set-last(%d)" % i])
-
-            elif proc.pc == 2:
-                if proc.k < N:
-                    proc.pc = 3
-                    yield (dst, self.actions["for-k(%d)" % i])
-                else:  # exit loop
-                    proc.k = 0
-                    proc.pc = 8
-                    yield (dst, self.actions["for-k(%d)" % i])
-
-            elif proc.pc == 3:
-                if proc.k == i:
-                    proc.k += 1
-                    proc.pc = 2
-                    yield (dst, self.actions["if-ki(%d)" % i])
-                else:  # enter wait state
-                    proc.pc = 5
-                    yield (dst, self.actions["if-ki(%d)" % i])
+    def _canonicalValue(self, v):
+        """
+        Returns the packed representative of packed value [v]: processes are
+         sorted by properties that do not depend on process IDs, and the IDs
+         in k, last and done are renamed accordingly. Processes that tie keep
+         their order, so a class may have more than one representative.
+        """
+        N, W, M = self.processes, self.width, self.mask
+        f = [(v >> (j * W)) & M for j in range(self.fields)]
+        pc, k = f[0:2 * N:2], f[1:2 * N:2]
+        level, last, done = f[2 * N:3 * N], f[3 * N:4 * N - 1], f[4 * N - 1:]
+
+        # order[new] is old process ID, rename[old] is new process ID
+        owns = [0] * N
+        for x in last:
+            owns[x] += 1
+        order = sorted(range(N), key=lambda i: (
+            pc[i], level[i], bin(done[i]).count("1"), owns[i],
+            (pc[k[i]], level[k[i]]) if pc[i] in (5, 6) else ()))
+        rename = [0] * N
+        for n, o in enumerate(order):
+            rename[o] = n
+
+        g = []
+        for o in order:
+            g.append(pc[o])
+            g.append(rename[k[o]] if pc[o] in (5, 6) else k[o])
+        g.extend(level[o] for o in order)
+        g.extend(rename[x] for x in last)
+        for o in order:
+            g.append(sum(1 << rename[x] for x in range(N)
+                         if done[o] >> x & 1))
+
+        return sum(x << (j * W) for j, x in enumerate(g))
+
+    def vectorBFS(self):
+        """
+        Alternative breadth-first engine that expands whole frontiers at once
+         using NumPy. Yields the frontier at each depth as a 2-D array with
+         one row per state, whose columns are the fields of the state in the
+         order given by iterating over a State.
+        """
+        if numpy is None:
+            raise ImportError("vectorBFS requires NumPy")
+
+        frontier = numpy.array([list(self.initialState)], dtype=numpy.uint8)
+        visited = self._vectorKeys(frontier)
+        while len(frontier):
+            yield frontier
 
-            elif proc.pc == 5:
-                if dst.last[dst.level[i]] != i or dst.level[proc.k] < dst.level[i]:  # wait until
-                    proc.pc = 6
-                yield (dst, self.actions["await(%d)" % i])
+            succ = numpy.concatenate(list(self._vectorSuccessors(frontier)))
+            keys, first = numpy.unique(self._vectorKeys(succ),
+                                       return_index=True)
 
-            elif proc.pc == 6:
-                proc.k += 1
-                proc.pc = 2
-                yield (dst, self.actions["for-k(%d)" % i])
+            # sorted merge of the new states into the visited keys
+            pos = numpy.searchsorted(visited, keys)
+            seen = pos < len(visited)
+            seen[seen] = visited[pos[seen]] == keys[seen]
+            new = ~seen
+
+            frontier = succ[first[new]]
+            visited = numpy.insert(visited, pos[new], keys[new])
+
+    def vectorLabels(self, frontier):
+        """
+        Returns a boolean array for a [frontier] of vectorBFS, whose element
+         (row, i) tells whether "proc i in CS" holds in that state.
+        """
+        return frontier[:, 0:2 * self.processes:2] == 5
+
+    def _vectorKeys(self, rows):
+        """
+        Returns a sortable key for each state in [rows]: the state packed into
+         an int64 if it fits, or else the raw bytes of the row.
+        """
+        N = self.processes
+        widths = [4, N.bit_length()] * N + [(N - 1).bit_length()] * (2 * N - 1)
+        if self.symmetric:
+            widths += [N] * N
+
+        if sum(widths) > 63:
+            rows = numpy.ascontiguousarray(rows)
+            return rows.view(numpy.dtype((numpy.void, rows.shape[1]))).ravel()
+
+        keys = numpy.zeros(len(rows), dtype=numpy.int64)
+        off = 0
+        for j, w in enumerate(widths):
+            keys |= rows[:, j].astype(numpy.int64) << off
+            off += w
+        return keys
+
+    def _vectorSuccessors(self, F):
+        """
+        Returns for each process and pc a 2-D array of the successors of the
+         states in [F] in which that process takes a step from that pc.
+        """
+        N = self.processes
+        level, last, done = 2 * N, 3 * N, 4 * N - 1
+        for i in range(N):
+            pc, k = 2 * i, 2 * i + 1
+            P = F[:, pc]
+
+            S = F[P == 0]
+            S[:, pc] = numpy.where(S[:, level + i] < N - 1, 1, 10)
+            yield S
+
+            S = F[P == 1]
+            S[numpy.arange(len(S)), last + S[:, level + i].astype(numpy.intp)] = i
+            S[:, pc] = 2
+            yield S
+
+            if self.symmetric:
+                D = F[:, done + i]
+                for j in range(N):
+                    if j != i:
+                        S = F[(P == 2) & ((D >> j) & 1 == 0)]
+                        S[:, k] = j
+                        S[:, pc] = 5
+                        yield S
+
+                others = ((1 << N) - 1) & ~(1 << i)
+                S = F[(P == 2) & (D & others == others)]
+                S[:, done + i] = 0
+                S[:, pc] = 8
+                yield S
+
+                S = F[P == 6]
+                S[:, done + i] |= (1 << S[:, k].astype(numpy.intp)).astype(
+                    numpy.uint8)
+                S[:, k] = 0
+                S[:, pc] = 2
+                yield S
+            else:
+                S = F[P == 2]
+                exit = S[:, k] >= N
+                S[:, pc] = numpy.where(exit, 8, 3)
+                S[exit, k] = 0
+                yield S
+
+                S = F[P == 3]
+                skip = S[:, k] == i
+                S[skip, k] += 1
+                S[:, pc] = numpy.where(skip, 2, 5)
+                yield S
+
+                S = F[P == 6]
+                S[:, k] += 1
+                S[:, pc] = 2
+                yield S
+
+            # wait until last[level[i]] != i or level[k] < level[i]
+            S = F[P == 5]
+            rows = numpy.arange(len(S))
+            lv = S[:, level + i]
+            go = (S[rows, last + lv.astype(numpy.intp)] != i) \
+                | (S[rows, level + S[:, k].astype(numpy.intp)] < lv)
+            S[go, pc] = 6
+            yield S
+
+            S = F[P == 8]
+            S[:, level + i] += 1
+            S[:, pc] = 0
+            yield S
+
+            S = F[P == 10]
+            S[:, pc] = 11
+            yield S
+
+            S = F[P == 11]
+            S[:, level + i] = 0
+            S[:, pc] = 0
+            yield S
+
+    def pack(self, state):
+        """
+        Returns a compact, picklable form of [state].
+        """
+        return state.value
 
-            elif proc.pc == 8:
-                dst.level[i] += 1
-                proc.pc = 0
-                yield (dst, self.actions["for-level(%d)" % i])
+    def unpack(self, data):
+        """
+        Returns the state for a packed form [data].
+        """
+        return State(self, data)
 
-            elif proc.pc == 10:
-                proc.pc = 11
-                yield (dst, self.actions["enter-cs(%d)" % i])
+    def nextStatesBranch(self, src: State):
+        """
+        Branch-based reference version of [nextStates] for models that are
+         not [symmetric], kept to cross-check and benchmark the table-driven
+         kernel.
+        """
+        N = self.processes
+        W, M = self.width, self.mask
+        v = src.value
+        for i in range(self.processes):
+            pcOff = 2 * i * W
+            kOff = pcOff + W
+            levelOff = (2 * N + i) * W
+
+            pc = (v >> pcOff) & M
+            if pc == 0:
+                if (v >> levelOff) & M < N - 1:
+                    dst = v + (1 << pcOff)
+                    yield (State(self, dst), self.actions["for-level(%d)" % i])
+                else:  # exit loop
+                    dst = v + (10 << pcOff)
+                    yield (State(self, dst), self.actions["for-level(%d)" % i])
+
+            elif pc == 1:
+                lastOff = (3 * N + ((v >> levelOff) & M)) * W
+                dst = v + ((i - ((v >> lastOff) & M)) << lastOff) + (1 << pcOff)
+                yield (State(self, dst), self.actions["set-last(%d)" % i])
+
+            elif pc == 2:
+                k = (v >> kOff) & M
+                if k < N:
+                    dst = v + (1 << pcOff)
+                    yield (State(self, dst), self.actions["for-k(%d)" % i])
+                else:  # exit loop
+                    dst = v - (k << kOff) + (6 << pcOff)
+                    yield (State(self, dst), self.actions["for-k(%d)" % i])
 
-            elif proc.pc == 11:
+            elif pc == 3:
+                if (v >> kOff) & M == i:
+                    dst = v + (1 << kOff) - (1 << pcOff)
+                    yield (State(self, dst), self.actions["if-ki(%d)" % i])
+                else:  # enter wait state
+                    dst = v + (2 << pcOff)
+                    yield (State(self, dst), self.actions["if-ki(%d)" % i])
+
+            elif pc == 5:
+                level = (v >> levelOff) & M
+                last = (v >> ((3 * N + level) * W)) & M
+                k = (v >> kOff) & M
+                dst = v
+                if last != i or (v >> ((2 * N + k) * W)) & M < level:  # wait until
+                    dst = v + (1 << pcOff)
+                yield (State(self, dst), self.actions["await(%d)" % i])
+
+            elif pc == 6:
+                dst = v + (1 << kOff) - (4 << pcOff)
+                yield (State(self, dst), self.actions["for-k(%d)" % i])
+
+            elif pc == 8:
+                dst = v + (1 << levelOff) - (8 << pcOff)
+                yield (State(self, dst), self.actions["for-level(%d)" % i])
+
+            elif pc == 10:
+                dst = v + (1 << pcOff)
+                yield (State(self, dst), self.actions["enter-cs(%d)" % i])
+
+            elif pc == 11:
                 # critical section
-                dst.level[i] = 0
-                proc.pc = 0
-                yield (dst, self.actions["exit-cs(%d)" % i])
+                dst = v - (((v >> levelOff) & M) << levelOff) - (11 << pcOff)
+                yield (State(self, dst), self.actions["exit-cs(%d)" % i])
 
             """
             0: for level[i] from 0 to (N - 1):
@@ -189,29 +532,18 @@ def main():
     # create a 3-process Peterson model
     mdl = Model(3)
 
-    count = 0
-    mutual = True
-    deadlocks = 0
-    for s in mdl.reach():
-        count += 1
-        if((count % 1000) == 0):
-            print(count)
-
-        if len(s.labels) > 1:
-            mutual = False
-
-        successors = mdl.nextStates(s)
-
-        try:
-            next(successors)
-        except StopIteration:
-            deadlocks += 1
-
-    print("%d reachable states" % count)
-    if not mutual:
-        print("Mutual exclusion is not satisfied.")
-    print("%d deadlocks" % deadlocks)
-    pass
+    # check mutual exclusion and deadlocks in one pass
+    inCS = [mdl.labels["proc %d in CS" % i] for i in range(mdl.processes)]
+    invariants = {"mutual exclusion": model.atMost(1, inCS)}
+    violation = mdl.check(invariants, deadlock=True, trace=True)
+
+    if violation is None:
+        print("Mutual exclusion is satisfied and there are no deadlocks.")
+    else:
+        print("Violation of %s:" % violation.name)
+        for act, dst in violation.trace:
+            print("  %s" % act.id)
+        print(violation.state)
 
 
 if(__name__ == "__main__"):